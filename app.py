@@ -1,10 +1,114 @@
+import os
+
 from dotenv import load_dotenv
 
-from src.agent import Agent
-from src.writer_gui import WriterGUI
+# stdlib only: the probes must answer before the heavy imports below
+from src.health import Readiness, serve
 
-if __name__ == "__main__":
+
+def build_caches(cache_dir):
+    """Disk-backed search and LLM caches under `cache_dir`, or defaults if unset."""
+    if not cache_dir:
+        return None, None
+    from src.cache import TieredCache
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, "cache.sqlite")
+    search_cache = TieredCache(
+        max_entries=512, ttl=24 * 3600, path=path, table="search_cache"
+    )
+    llm_cache = TieredCache(max_entries=256, path=path, table="llm_cache")
+    return search_cache, llm_cache
+
+
+def build_checkpointing(db_path):
+    """SQLite checkpointer settings plus a background compactor, or in-memory if unset."""
+    if not db_path:
+        return {"checkpointer": "memory"}, None
+    from src.checkpointing import CheckpointCompactor
+    from src.content_store import PassagePool
+
+    keep_last = os.getenv("CHECKPOINT_KEEP_LAST")
+    ttl = os.getenv("CHECKPOINT_TTL")
+    passage_ttl = os.getenv("PASSAGE_TTL")  # defaults to CHECKPOINT_TTL
+    compactor = CheckpointCompactor(
+        db_path,
+        keep_last=int(keep_last) if keep_last else None,
+        ttl=float(ttl) if ttl else None,
+        passage_ttl=float(passage_ttl) if passage_ttl else None,
+    )
+    options = {
+        "checkpointer": "sqlite",
+        "checkpoint_path": db_path,
+        # research passages live next to the checkpoints that reference them
+        "passage_pool": PassagePool(path=db_path),
+    }
+    return options, compactor
+
+
+def build_tracer():
+    """Node instrumentation, optionally logged to TRACE_PATH and served on METRICS_PORT."""
+    from src.instrumentation import Tracer
+
+    prices = os.getenv("TOKEN_PRICES")  # USD per million tokens: "prompt,completion"
+    return Tracer(
+        path=os.getenv("TRACE_PATH"),
+        prices=tuple(float(p) for p in prices.split(",")) if prices else None,
+    )
+
+
+def main():
     _ = load_dotenv()
-    MultiAgent = Agent()
-    app = WriterGUI(MultiAgent.graph)
-    app.launch()
+    readiness = Readiness()
+    if port := os.getenv("HEALTH_PORT"):
+        # /healthz and /readyz, listening before langgraph and gradio load
+        serve(int(port), readiness.routes(), host="0.0.0.0")
+
+    readiness.set("building agent")
+    from src.agent import Agent
+
+    search_cache, llm_cache = build_caches(os.getenv("CACHE_DIR"))
+    checkpoint_options, compactor = build_checkpointing(os.getenv("CHECKPOINT_DB"))
+    tracer = build_tracer()
+    # model and search clients are created on the first call, not here
+    MultiAgent = Agent(
+        # an OpenRouter model name, or "ollama:<model>" for a local model
+        model=os.getenv("MODEL", "openai/gpt-4o"),
+        # query generation and critique; set FAST_MODEL= to use MODEL everywhere
+        fast_model=os.getenv("FAST_MODEL", "openai/gpt-4o-mini") or None,
+        search_cache=search_cache,
+        llm_cache=llm_cache,
+        tracer=tracer,
+        **checkpoint_options,
+    )
+    if compactor is not None:
+        compactor.start()
+    if port := os.getenv("METRICS_PORT"):
+        # /metrics and /spans; all interfaces by default, like the probes, so
+        # a scraper in another container or pod can reach them
+        tracer.serve(int(port), host=os.getenv("METRICS_HOST", "0.0.0.0"))
+
+    readiness.set("building interface")
+    from src.writer_gui import WriterGUI
+
+    speculator = None
+    if os.getenv("SPECULATE"):
+        # run the next node while a paused essay waits for "Continue Essay"
+        from src.speculation import Speculator
+
+        speculator = Speculator(MultiAgent.graph, MultiAgent.nodes)
+        tracer.gauges.append(speculator.metrics)
+    app = WriterGUI(
+        MultiAgent.graph,
+        passages=MultiAgent.passages,
+        tracer=tracer,
+        speculator=speculator,
+    )
+    if compactor is not None:
+        compactor.on_expire.append(app.forget_threads)
+    readiness.set("starting server")
+    app.launch(on_ready=readiness.mark_ready)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""Headless batch essay generation.
+
+Reads topics from a JSONL file, one object per line:
+
+    {"id": "nepal-ai", "topic": "TAI Inc in Nepal and its CEO", "max_revisions": 2}
+
+and runs each through the agent graph without interrupts on a pool of worker
+threads, or with --async as coroutines on one event loop, appending every
+finished essay to the output JSONL as soon as it is done. Progress is
+checkpointed to SQLite, so rerunning the same command after a crash skips
+finished topics and resumes unfinished ones where they stopped. Model calls
+and searches share rate limits, back off on 429/5xx and adapt concurrency.
+
+    python batch.py topics.jsonl essays.jsonl --workers 8 --llm-rpm 120
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from src.agent import Agent
+from src.agent_state import new_essay_state
+from src.checkpointing import make_async_checkpointer
+from src.content_store import PassagePool
+from src.rate_limit import ProviderLimiter
+
+
+def load_jobs(path):
+    jobs = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            job.setdefault("id", str(lineno))
+            job.setdefault("max_revisions", 2)
+            jobs.append(job)
+    return jobs
+
+
+def finished_ids(path):
+    """Ids already in the output; a record cut short by a crash is skipped."""
+    if not os.path.exists(path):
+        return set()
+    ids = set()
+    with open(path) as f:
+        text = f.read()
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        try:
+            ids.add(json.loads(line)["id"])
+        except (ValueError, KeyError):
+            print(f"Warning: skipping unreadable output line: {line[:80]!r}")
+    if text and not text.endswith("\n"):
+        # start the next record on its own line, not after the broken one
+        with open(path, "a") as f:
+            f.write("\n")
+    return ids
+
+
+class BatchRunner:
+    def __init__(self, agent, output_path):
+        self.graph = agent.graph
+        self.output_path = output_path
+        self._write_lock = threading.Lock()
+
+    def _config(self, job):
+        return {
+            "configurable": {"thread_id": f"batch-{job['id']}"},
+            # each revision is three steps: reflect, research_critique, generate
+            "recursion_limit": 10 + 4 * job["max_revisions"],
+        }
+
+    def _write(self, job, values, start):
+        record = {
+            "id": job["id"],
+            "topic": job["topic"],
+            "essay": values.get("draft"),
+            "plan": values.get("plan"),
+            "critique": values.get("critique"),
+            "revision_number": values.get("revision_number"),
+            "converged": values.get("converged"),
+            "llm_calls_saved": values.get("llm_calls_saved"),
+            "elapsed": round(time.perf_counter() - start, 3),
+        }
+        with self._write_lock, open(self.output_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+        return record
+
+    def run_job(self, job):
+        start = time.perf_counter()
+        config = self._config(job)
+        state = self.graph.get_state(config)
+        if not state.values:
+            self.graph.invoke(
+                new_essay_state(job["topic"], job["max_revisions"]), config
+            )
+        elif state.next:
+            # interrupted by a crash: continue from the last checkpoint
+            self.graph.invoke(None, config)
+        return self._write(job, self.graph.get_state(config).values, start)
+
+    async def arun_job(self, job):
+        start = time.perf_counter()
+        config = self._config(job)
+        state = await self.graph.aget_state(config)
+        if not state.values:
+            await self.graph.ainvoke(
+                new_essay_state(job["topic"], job["max_revisions"]), config
+            )
+        elif state.next:
+            await self.graph.ainvoke(None, config)
+        values = (await self.graph.aget_state(config)).values
+        return self._write(job, values, start)
+
+    def run(self, jobs, workers):
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self.run_job, job): job for job in jobs}
+            for future in as_completed(futures):
+                job = futures[future]
+                try:
+                    record = future.result()
+                except Exception as exc:
+                    failed += 1
+                    print(f"[{job['id']}] failed: {exc}", file=sys.stderr)
+                else:
+                    done += 1
+                    print(f"[{record['id']}] done in {record['elapsed']}s")
+        return done, failed
+
+    async def arun(self, jobs, concurrency):
+        """Run jobs as coroutines on the current loop, `concurrency` at a time."""
+        semaphore = asyncio.Semaphore(concurrency)
+        done = failed = 0
+
+        async def run_one(job):
+            nonlocal done, failed
+            async with semaphore:
+                try:
+                    record = await self.arun_job(job)
+                except Exception as exc:
+                    failed += 1
+                    print(f"[{job['id']}] failed: {exc}", file=sys.stderr)
+                else:
+                    done += 1
+                    print(f"[{record['id']}] done in {record['elapsed']}s")
+
+        await asyncio.gather(*(run_one(job) for job in jobs))
+        return done, failed
+
+
+def build_agent(args, checkpointer):
+    return Agent(
+        model=args.model,
+        fast_model=args.fast_model or None,
+        checkpointer=checkpointer,
+        checkpoint_path=args.checkpoint_db,
+        passage_pool=PassagePool(path=args.checkpoint_db),
+        interrupt_after=[],
+        # every worker runs up to three searches at once
+        research_workers=max(4, args.workers * 3),
+        llm_rate_limiter=ProviderLimiter.for_model(args.llm_rpm, args.llm_tpm),
+        search_rate_limiter=ProviderLimiter.for_search(args.search_rps),
+    )
+
+
+async def arun(args, jobs):
+    # the aiosqlite checkpointer binds to the loop it is created on
+    checkpointer = await make_async_checkpointer(args.checkpoint_db)
+    try:
+        agent = build_agent(args, checkpointer)
+        return agent, await BatchRunner(agent, args.output).arun(jobs, args.workers)
+    finally:
+        await checkpointer.conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate essays in batch.")
+    parser.add_argument("topics", help="input JSONL with topic and max_revisions")
+    parser.add_argument("output", help="output JSONL, appended to as essays finish")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent essays")
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="run essays as coroutines on one event loop instead of threads",
+    )
+    parser.add_argument(
+        "--model", default="openai/gpt-4o", help='OpenRouter name or "ollama:<model>"'
+    )
+    parser.add_argument(
+        "--fast-model",
+        default="openai/gpt-4o-mini",
+        help='model for queries and critique; "" uses --model everywhere',
+    )
+    parser.add_argument("--checkpoint-db", default="batch_checkpoints.sqlite")
+    parser.add_argument("--llm-rpm", type=float, default=120, help="model requests/min")
+    parser.add_argument("--llm-tpm", type=float, help="model tokens/min")
+    parser.add_argument("--search-rps", type=float, default=5, help="searches/second")
+    args = parser.parse_args(argv)
+
+    _ = load_dotenv()
+    skip = finished_ids(args.output)
+    jobs = [job for job in load_jobs(args.topics) if job["id"] not in skip]
+    print(f"{len(jobs)} topics to run, {len(skip)} already finished")
+    if args.use_async:
+        agent, (done, failed) = asyncio.run(arun(args, jobs))
+    else:
+        agent = build_agent(args, "sqlite")
+        done, failed = BatchRunner(agent, args.output).run(jobs, args.workers)
+    print(f"finished {done}, failed {failed}")
+    print(json.dumps(agent.rate_limit_metrics()))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+"""Compare sequential vs concurrent Tavily searches against a stubbed client.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_research
+"""
+
+import time
+
+from src.research import ResearchExecutor
+
+
+class StubTavilyClient:
+    """Stands in for `TavilyClient`, sleeping for a fixed latency per query."""
+
+    def __init__(self, latencies):
+        self.latencies = latencies
+
+    def search(self, query, max_results=2):
+        time.sleep(self.latencies[query])
+        return {
+            "results": [
+                {"content": f"{query} result {i}", "url": f"https://example.com/{i}"}
+                for i in range(max_results)
+            ]
+        }
+
+
+def sequential(client, queries):
+    return [client.search(query=q, max_results=2)["results"] for q in queries]
+
+
+def main():
+    latencies = {"query one": 0.4, "query two": 0.8, "query three": 0.6}
+    queries = list(latencies)
+    client = StubTavilyClient(latencies)
+    executor = ResearchExecutor(client, max_workers=len(queries))
+
+    start = time.perf_counter()
+    expected = sequential(client, queries)
+    seq_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = executor.search_all(queries)
+    conc_time = time.perf_counter() - start
+    executor.shutdown()
+
+    assert results == expected, "concurrent results must keep query order"
+    print(f"sum of latencies : {sum(latencies.values()):.2f}s")
+    print(f"max of latencies : {max(latencies.values()):.2f}s")
+    print(f"sequential       : {seq_time:.2f}s")
+    print(f"concurrent       : {conc_time:.2f}s")
+    print(f"speedup          : {seq_time / conc_time:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Deterministic, offline stand-ins for `ChatOpenAI` and the Tavily clients."""
+
+import asyncio
+import hashlib
+import time
+
+from langchain_core.messages import AIMessage
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+
+
+class FakeChatModel:
+    """Answers every prompt after `latency` seconds with `output_words` words.
+
+    Replies come in `PARAGRAPHS` paragraphs and depend only on the prompt,
+    like a real model at temperature=0.
+    """
+
+    PARAGRAPHS = 5
+
+    def __init__(
+        self, model_name="fake/model", latency=0.0, output_words=200, num_queries=3
+    ):
+        self.model_name = model_name
+        self.latency = latency
+        self.output_words = output_words
+        # search queries per structured Queries response
+        self.num_queries = num_queries
+        self.calls = 0
+
+    def _seed(self, messages):
+        self.calls += 1
+        return _digest("".join(str(m.content) for m in messages))
+
+    def _reply(self, messages):
+        time.sleep(self.latency)
+        return self._seed(messages)
+
+    async def _areply(self, messages):
+        await asyncio.sleep(self.latency)
+        return self._seed(messages)
+
+    def _text(self, seed, words):
+        return " ".join(f"w{seed}{i % 50}" for i in range(words))
+
+    def _message(self, seed):
+        words = max(1, self.output_words // self.PARAGRAPHS)
+        paragraphs = [self._text(seed, words) for _ in range(self.PARAGRAPHS)]
+        return AIMessage(content="\n\n".join(paragraphs))
+
+    def invoke(self, messages, *args, **kwargs):
+        return self._message(self._reply(messages))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return self._message(await self._areply(messages))
+
+    def with_structured_output(self, schema):
+        return FakeStructuredModel(self, schema)
+
+
+class FakeStructuredModel:
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def _response(self, seed):
+        if "edits" in self.schema.model_fields:
+            # a revision that rewrites the first paragraph of the draft
+            words = max(1, self.model.output_words // self.model.PARAGRAPHS)
+            text = self.model._text(seed, words)
+            return self.schema.model_validate(
+                {"edits": [{"paragraph": 1, "action": "replace", "text": text}]}
+            )
+        queries = [f"query {seed} {i}" for i in range(self.model.num_queries)]
+        return self.schema(queries=queries)
+
+    def invoke(self, messages, *args, **kwargs):
+        return self._response(self.model._reply(messages))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return self._response(await self.model._areply(messages))
+
+
+class FakeSearchClient:
+    """Returns `max_results` passages of `passage_words` words per query."""
+
+    def __init__(self, latency=0.0, passage_words=80):
+        self.latency = latency
+        self.passage_words = passage_words
+        self.calls = 0
+
+    def search(self, query, max_results=2, **kwargs):
+        time.sleep(self.latency)
+        return self._response(query, max_results)
+
+    def _response(self, query, max_results):
+        self.calls += 1
+        seed = _digest(query)
+        return {
+            "query": query,
+            "results": [
+                {
+                    "url": f"https://example.com/{seed}/{i}",
+                    "content": " ".join(
+                        f"{seed}{i}x{j}" for j in range(self.passage_words)
+                    ),
+                    "score": 1.0 / (i + 1),
+                }
+                for i in range(max_results)
+            ],
+        }
+
+
+class FakeAsyncSearchClient(FakeSearchClient):
+    """`FakeSearchClient` with the coroutine `search` of `AsyncTavilyClient`."""
+
+    async def search(self, query, max_results=2, **kwargs):
+        await asyncio.sleep(self.latency)
+        return self._response(query, max_results)
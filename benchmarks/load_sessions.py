@@ -0,0 +1,61 @@
+"""Drive several simulated WriterGUI sessions at once against one graph.
+
+Each session runs a full essay through `WriterGUI.run_agent` with the fake
+model and search client, first one after another and then concurrently.
+The run checks that no session sees another session's thread.
+
+    python -m benchmarks.load_sessions --sessions 8 --latency 0.05
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeChatModel, FakeSearchClient
+from src.agent import Agent
+from src.session import Session
+from src.writer_gui import WriterGUI
+
+
+def run_session(gui, topic):
+    session = Session()
+    for _ in gui.run_agent(session, True, topic, []):
+        pass
+    state = gui.graph.get_state(session.thread)
+    assert state.values["task"] == topic, "session saw another session's thread"
+    assert not state.next, "essay did not finish"
+    return session.thread_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    agent = Agent(
+        chat_model=FakeChatModel(latency=args.latency),
+        search_client=FakeSearchClient(latency=args.latency),
+    )
+    gui = WriterGUI(agent.graph, concurrency_limit=args.sessions)
+    topics = [f"load test topic {i}" for i in range(args.sessions)]
+
+    start = time.perf_counter()
+    for topic in topics:
+        run_session(gui, f"serial {topic}")
+    serial = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+        thread_ids = list(pool.map(lambda t: run_session(gui, t), topics))
+    concurrent = time.perf_counter() - start
+
+    assert len(set(thread_ids)) == len(thread_ids), "sessions shared a thread id"
+    print(f"sessions   : {args.sessions}")
+    print(f"serial     : {serial:.2f}s")
+    print(f"concurrent : {concurrent:.2f}s")
+    print(f"speedup    : {serial / concurrent:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
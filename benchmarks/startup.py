@@ -0,0 +1,147 @@
+"""Cold-start benchmark for `app.py`.
+
+Measures the module import time of `app` with `python -X importtime`, then
+launches `app.py` with HEALTH_PORT set and times how long it takes to
+answer `/healthz` (listening) and `/readyz` (agent and interface built).
+No model or search calls are made.
+
+    python -m benchmarks.startup --out startup.json
+    python -m benchmarks.startup --budget 2.0   # exit 1 if not listening in 2s
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module="app", top=10):
+    """Total import time of `module` and its slowest imports, in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # "import time: self [us] | cumulative | imported package"
+    # children are listed before their parent, indented one level deeper
+    children = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        ms = int(cumulative) / 1000
+        if depth == 0 and name.strip() == module:
+            slowest = sorted(children, key=lambda row: row[1], reverse=True)
+            return round(ms, 1), slowest[:top]
+        if depth == 0:
+            children = []
+        elif depth == 1:
+            children.append((name.strip(), round(ms, 1)))
+    raise RuntimeError(f"no import time reported for {module}")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as exc:
+        return exc.code
+    except OSError:
+        return None
+
+
+def time_to_ready(timeout=120.0):
+    """Seconds from launching `app.py` until /healthz and /readyz answer 200."""
+    health_port = _free_port()
+    env = {
+        **os.environ,
+        "HEALTH_PORT": str(health_port),
+        "GRADIO_SERVER_PORT": str(_free_port()),
+        "GRADIO_ANALYTICS_ENABLED": "False",
+    }
+    env.pop("PORT1", None)
+    base = f"http://127.0.0.1:{health_port}"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "app.py"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    listen = ready = None
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"app.py exited with code {process.returncode}")
+            if listen is None and _get(base + "/healthz") == 200:
+                listen = time.perf_counter() - start
+            if listen is not None and _get(base + "/readyz") == 200:
+                ready = time.perf_counter() - start
+                break
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        process.wait()
+    if ready is None:
+        raise RuntimeError(f"app.py was not ready within {timeout}s")
+    return round(listen, 3), round(ready, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="JSON results file")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument(
+        "--budget", type=float, help="fail if time-to-listen exceeds this (seconds)"
+    )
+    args = parser.parse_args()
+
+    import_ms, slowest = import_times()
+    print(f"import app: {import_ms:.1f} ms")
+    for name, ms in slowest:
+        print(f"  {name:<30} {ms:8.1f} ms")
+
+    runs = [time_to_ready() for _ in range(args.runs)]
+    listen = min(run[0] for run in runs)
+    ready = min(run[1] for run in runs)
+    print(f"time to listen: {listen:.3f} s, time to ready: {ready:.3f} s")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(
+                {
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "import_ms": import_ms,
+                    "slowest_imports": slowest,
+                    "listen_s": listen,
+                    "ready_s": ready,
+                    "runs": runs,
+                },
+                f,
+                indent=2,
+            )
+        print(f"wrote {args.out}")
+    if args.budget is not None and listen > args.budget:
+        print(f"time to listen {listen:.3f}s is over the {args.budget}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
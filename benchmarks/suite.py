@@ -0,0 +1,228 @@
+"""Offline benchmark suite for the agent's own overhead.
+
+Runs full essays against the fake model and search client, with a SQLite
+checkpointer, across a grid of `max_revisions` and research volumes. For
+each configuration it reports essays/second, wall time per node run and
+the part of it spent outside the nodes (graph execution, checkpointing,
+state copying), checkpoint bytes per step, the cost of the GUI's history
+scans, and peak RSS. Every configuration runs in a fresh process so peak
+RSS is its own.
+
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --out new.json --baseline bench.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+# research volume: search queries per research step and words per passage
+RESEARCH = {
+    "small": {"num_queries": 3, "passage_words": 80},
+    "large": {"num_queries": 8, "passage_words": 400},
+}
+
+# (metric, True when higher is better) compared against --baseline
+COMPARED = [
+    ("essays_per_second", True),
+    ("ms_per_step", False),
+    ("overhead_ms_per_step", False),
+    ("checkpoint_bytes_per_step", False),
+    ("history_scan_ms", False),
+    ("peak_rss_mb", False),
+]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _checkpoint_bytes(path):
+    conn = sqlite3.connect(path)
+    try:
+        checkpoints, blobs = conn.execute(
+            "SELECT COUNT(*), SUM(LENGTH(checkpoint) + LENGTH(metadata))"
+            " FROM checkpoints"
+        ).fetchone()
+        (writes,) = conn.execute("SELECT SUM(LENGTH(value)) FROM writes").fetchone()
+    finally:
+        conn.close()
+    return checkpoints, (blobs or 0) + (writes or 0)
+
+
+def run_config(max_revisions, research, essays, latency, output_words):
+    """Run `essays` essays for one configuration and return its measurements."""
+    from benchmarks.fakes import FakeChatModel, FakeSearchClient
+    from src.agent import Agent
+    from src.agent_state import new_essay_state
+    from src.content_store import PassagePool
+    from src.history_index import HistoryIndex
+
+    volume = RESEARCH[research]
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, "checkpoints.sqlite")
+        agent = Agent(
+            chat_model=FakeChatModel(
+                latency=latency,
+                output_words=output_words,
+                num_queries=volume["num_queries"],
+            ),
+            search_client=FakeSearchClient(
+                latency=latency, passage_words=volume["passage_words"]
+            ),
+            checkpointer="sqlite",
+            checkpoint_path=db,
+            passage_pool=PassagePool(path=db),
+            interrupt_after=[],
+        )
+        configs = [
+            {
+                "configurable": {"thread_id": f"bench-{i}"},
+                "recursion_limit": 10 + 4 * max_revisions,
+            }
+            for i in range(essays)
+        ]
+        start = time.perf_counter()
+        for i, config in enumerate(configs):
+            # distinct topics so the LLM and search caches do not short-circuit
+            agent.graph.invoke(new_essay_state(f"topic {i}", max_revisions), config)
+        wall = time.perf_counter() - start
+
+        spans = agent.tracer.finished()
+        node_seconds = sum(s["duration_ms"] for s in spans) / 1000
+        checkpoints, checkpoint_bytes = _checkpoint_bytes(db)
+
+        # the GUI lists a thread's history on every display update
+        start = time.perf_counter()
+        for config in configs:
+            list(agent.graph.get_state_history(config))
+        history_scan = (time.perf_counter() - start) / essays
+        index = HistoryIndex(agent.graph)
+        start = time.perf_counter()
+        for config in configs:
+            index.sync(config)
+            index.page(config)
+        index_scan = (time.perf_counter() - start) / essays
+        passages = len(agent.passages)
+        agent.research.shutdown()
+
+    return {
+        "max_revisions": max_revisions,
+        "research": research,
+        "essays": essays,
+        "latency": latency,
+        "essays_per_second": round(essays / wall, 3),
+        "node_runs": len(spans),
+        "ms_per_step": round(wall * 1000 / len(spans), 3),
+        "overhead_ms_per_step": round((wall - node_seconds) * 1000 / len(spans), 3),
+        "checkpoints": checkpoints,
+        "checkpoint_bytes_per_step": round(checkpoint_bytes / checkpoints),
+        "passages": passages,
+        "history_scan_ms": round(history_scan * 1000, 3),
+        "history_index_ms": round(index_scan * 1000, 3),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline):
+    """Print each metric's change against the matching baseline configuration."""
+
+    def key(result):
+        return result["max_revisions"], result["research"]
+
+    previous = {key(r): r for r in baseline["results"]}
+    print(f"\nagainst {baseline.get('commit') or 'baseline'}:")
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        changes = []
+        for metric, higher_is_better in COMPARED:
+            if not old.get(metric):
+                continue
+            change = (result[metric] - old[metric]) / old[metric] * 100
+            worse = change < 0 if higher_is_better else change > 0
+            flag = " !" if worse and abs(change) > 10 else ""
+            changes.append(f"{metric} {change:+.1f}%{flag}")
+        print(f"  revisions={result['max_revisions']} research={result['research']}")
+        print("    " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="bench.json", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--revisions", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--research", nargs="+", choices=sorted(RESEARCH), default=sorted(RESEARCH)
+    )
+    parser.add_argument("--essays", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--output-words", type=int, default=400)
+    args = parser.parse_args()
+
+    results = []
+    for max_revisions, research in itertools.product(args.revisions, args.research):
+        # a fresh process per configuration keeps peak RSS separate
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            result = pool.submit(
+                run_config,
+                max_revisions,
+                research,
+                args.essays,
+                args.latency,
+                args.output_words,
+            ).result()
+        results.append(result)
+        print(
+            f"revisions={max_revisions} research={research:<5} "
+            f"{result['essays_per_second']:8.2f} essays/s "
+            f"{result['ms_per_step']:7.2f} ms/step "
+            f"({result['overhead_ms_per_step']:.2f} outside nodes) "
+            f"{result['checkpoint_bytes_per_step']:7d} B/checkpoint "
+            f"{result['peak_rss_mb']:6.1f} MB"
+        )
+
+    report = {
+        "commit": _commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": vars(args),
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"wrote {args.out}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,147 +1,434 @@
-import os
-
 # Third-party imports
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import END, StateGraph
-from tavily import TavilyClient
+from langgraph.graph import END, START, StateGraph
 
 # Local module imports
-from .agent_state import AgentState, Queries
+from .agent_state import AgentState, DraftEdits, Queries
 from .constants import (
     PLAN_PROMPT,
     REFLECTION_PROMPT,
     RESEARCH_CRITIQUE_PROMPT,
     RESEARCH_PLAN_PROMPT,
+    REVISION_PROMPT,
     WRITER_PROMPT,
 )
+from .cache import CachedSearchClient, TieredCache
+from .checkpointing import make_checkpointer
+from .content_store import ContentStore, PassagePool, count_tokens, passage_text
+from .convergence import ConvergencePolicy
+from .instrumentation import InstrumentedChatModel, InstrumentedSearchClient, Tracer
+from .llm_cache import CachedChatModel
+from .providers import TavilySearch, model_from_name
+from .ranking import select_passages
+from .rate_limit import ProviderLimiter, RateLimitedChatModel, RateLimitedSearchClient
+from .research import ResearchExecutor, SearchAdapter
+from .revisions import DraftEditor, numbered_draft
+from .routing import FAST_NODES, FallbackChatModel, FallbackCounter, ModelRouter
 
 
 class Agent:
-    def __init__(self, model="openai/gpt-4o"):
-        self.model = ChatOpenAI(
-            model=model, temperature=0, base_url="https://openrouter.ai/api/v1"
+    NODES = ["planner", "generate", "reflect", "research_plan", "research_critique"]
+
+    def __init__(
+        self,
+        model="openai/gpt-4o",
+        research_workers=4,
+        search_timeout=20.0,
+        search_cache=None,
+        llm_cache=None,
+        llm_cache_bypass=(),
+        content_token_budget=6000,
+        writer_token_budget=3000,
+        convergence_threshold=0.95,
+        incremental_revisions=True,
+        chat_model=None,
+        fast_model=None,
+        node_models=None,
+        fallback_timeout=15.0,
+        search_client=None,
+        async_search_client=None,
+        checkpointer="memory",
+        checkpoint_path="checkpoints.sqlite",
+        passage_pool=None,
+        interrupt_after=None,
+        llm_rate_limiter=None,
+        search_rate_limiter=None,
+        tracer=None,
+    ):
+        # chat_model is any model provider (see providers.py); by default the
+        # `model` name picks one, e.g. "openai/gpt-4o" or "ollama:llama3.2"
+        self.model = chat_model or model_from_name(model)
+        # every model call and search goes through a shared ProviderLimiter;
+        # the defaults only adapt concurrency and retry, without fixed rates
+        self.llm_limiter = llm_rate_limiter or ProviderLimiter.for_model()
+        self.search_limiter = search_rate_limiter or ProviderLimiter.for_search()
+        # one span per node run, with the tokens and searches made inside it
+        self.tracer = tracer or Tracer()
+        self.tracer.gauges.append(self.rate_limit_metrics)
+        # temperature=0 makes identical prompts safe to answer from the cache;
+        # node names in llm_cache_bypass always call the model
+        llm_cache = llm_cache or TieredCache(max_entries=256)
+
+        def cached(chat_model):
+            return CachedChatModel(
+                RateLimitedChatModel(chat_model, self.llm_limiter),
+                llm_cache,
+                bypass=llm_cache_bypass,
+            )
+
+        # fast_model answers the query and critique nodes, node_models maps
+        # any node to its own model (a name or a provider); a routed model
+        # that times out falls back to the main model
+        routes = dict.fromkeys(FAST_NODES, fast_model) if fast_model else {}
+        routes.update(node_models or {})
+        main = InstrumentedChatModel(self.model, self.tracer)
+        fallbacks = FallbackCounter()
+        providers = {}
+        routed = {}
+        for node, route in routes.items():
+            if isinstance(route, str):
+                route = providers.setdefault(route, model_from_name(route))
+            routed[node] = cached(
+                FallbackChatModel(
+                    InstrumentedChatModel(route, self.tracer),
+                    main,
+                    timeout=fallback_timeout,
+                    counter=fallbacks,
+                )
+            )
+        self.llm = ModelRouter(cached(main), routed, fallbacks)
+        self.tracer.gauges.append(self.llm.metrics)
+        # search_client is any search provider; a plain sync client gets an
+        # asearch that uses async_search_client or a worker thread
+        if search_client is None:
+            search = TavilySearch()
+        elif hasattr(search_client, "asearch"):
+            search = search_client
+        else:
+            search = SearchAdapter(search_client, async_search_client)
+        self.search_client = search
+        # repeated queries across essays are answered from the cache
+        self.search_cache = search_cache or TieredCache(max_entries=512, ttl=24 * 3600)
+        self.research = ResearchExecutor(
+            CachedSearchClient(
+                RateLimitedSearchClient(
+                    InstrumentedSearchClient(search, self.tracer), self.search_limiter
+                ),
+                self.search_cache,
+            ),
+            max_workers=research_workers,
+            timeout=search_timeout,
+        )
+        # state["content"] holds passage ids; the text lives in this pool, kept
+        # in the checkpoint database when the checkpoints are durable
+        if passage_pool is None:
+            passage_pool = PassagePool(
+                path=checkpoint_path if checkpointer == "sqlite" else None
+            )
+        self.passages = passage_pool
+        self.content_store = ContentStore(
+            self.passages, token_budget=content_token_budget
         )
-        self.tavily = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
+        self.writer_token_budget = writer_token_budget
+        # stop revising once a draft is this similar to the previous one;
+        # None always runs max_revisions
+        self.convergence = None
+        if convergence_threshold is not None:
+            self.convergence = ConvergencePolicy(convergence_threshold)
+            self.tracer.gauges.append(self.convergence.metrics)
+        # revisions ask for paragraph edits instead of a whole new essay, so
+        # output tokens follow the size of the change; False always rewrites
+        self.editor = None
+        if incremental_revisions:
+            self.editor = DraftEditor()
+            self.tracer.gauges.append(self.editor.metrics)
         self.PLAN_PROMPT = PLAN_PROMPT
         self.WRITER_PROMPT = WRITER_PROMPT
+        self.REVISION_PROMPT = REVISION_PROMPT
         self.RESEARCH_PLAN_PROMPT = RESEARCH_PLAN_PROMPT
         self.REFLECTION_PROMPT = REFLECTION_PROMPT
         self.RESEARCH_CRITIQUE_PROMPT = RESEARCH_CRITIQUE_PROMPT
         builder = StateGraph(AgentState)
-        builder.add_node("planner", self.plan_node)
-        builder.add_node("research_plan", self.research_plan_node)
-        builder.add_node("generate", self.generation_node)
-        builder.add_node("reflect", self.reflection_node)
-        builder.add_node("research_critique", self.research_critique_node)
-        builder.set_entry_point("planner")
+        # each node has a sync and an async implementation, so the compiled
+        # graph serves invoke/stream as well as ainvoke/astream
+        trace = self.tracer.node
+        # the traced node runnables, also run directly by speculation.Speculator
+        self.nodes = {
+            "planner": trace("planner", self.plan_node, self.aplan_node),
+            "research_plan": trace(
+                "research_plan", self.research_plan_node, self.aresearch_plan_node
+            ),
+            "generate": trace("generate", self.generation_node, self.ageneration_node),
+            "reflect": trace("reflect", self.reflection_node, self.areflection_node),
+            "research_critique": trace(
+                "research_critique",
+                self.research_critique_node,
+                self.aresearch_critique_node,
+            ),
+        }
+        for name, node in self.nodes.items():
+            builder.add_node(name, node)
+        # research_plan only needs the task, so it runs alongside the planner;
+        # both finish in the same step and generate starts once after them
+        builder.add_edge(START, "planner")
+        builder.add_edge(START, "research_plan")
         builder.add_conditional_edges(
             "generate", self.should_continue, {END: END, "reflect": "reflect"}
         )
-        builder.add_edge("planner", "research_plan")
+        builder.add_edge("planner", "generate")
         builder.add_edge("research_plan", "generate")
         builder.add_edge("reflect", "research_critique")
         builder.add_edge("research_critique", "generate")
-        memory = MemorySaver()
+        # a backend name ("memory", "sqlite") or a ready checkpointer instance
+        if isinstance(checkpointer, str):
+            checkpointer = make_checkpointer(checkpointer, checkpoint_path)
+        self.checkpointer = checkpointer
         self.graph = builder.compile(
-            checkpointer=memory,
-            interrupt_after=[
-                "planner",
-                "generate",
-                "reflect",
-                "research_plan",
-                "research_critique",
-            ],
+            checkpointer=checkpointer,
+            # pause after every node for the GUI; pass [] to run straight through
+            interrupt_after=self.NODES if interrupt_after is None else interrupt_after,
         )
 
-    def plan_node(self, state: AgentState):
-        messages = [
+    def _plan_messages(self, state):
+        return [
             SystemMessage(content=self.PLAN_PROMPT),
             HumanMessage(content=state["task"]),
         ]
-        response = self.model.invoke(messages)
+
+    def plan_node(self, state: AgentState):
+        response = self.llm.invoke(self._plan_messages(state), node="planner")
+        return {"plan": response.content, "lnode": "planner", "count": 1}
+
+    async def aplan_node(self, state: AgentState):
+        response = await self.llm.ainvoke(self._plan_messages(state), node="planner")
+        return {"plan": response.content, "lnode": "planner", "count": 1}
+
+    def _research_plan_messages(self, state):
+        return [
+            SystemMessage(content=self.RESEARCH_PLAN_PROMPT),
+            HumanMessage(content=state["task"]),
+        ]
+
+    def _merge_results(self, state, results):
+        return self.content_store.merge(
+            state.get("content"), [r for batch in results for r in batch]
+        )
+
+    def research_plan_node(self, state: AgentState):
+        queries = self.llm.invoke(
+            self._research_plan_messages(state), node="research_plan", schema=Queries
+        )
+        results = self.research.search_all(queries.queries)
         return {
-            "plan": response.content,
-            "lnode": "planner",
+            "content": self._merge_results(state, results),
+            "queries": queries.queries,
+            "lnode": "research_plan",
             "count": 1,
         }
 
-    def research_plan_node(self, state: AgentState):
-        queries = self.model.with_structured_output(Queries).invoke(
-            [
-                SystemMessage(content=self.RESEARCH_PLAN_PROMPT),
-                HumanMessage(content=state["task"]),
-            ]
-        )
-        content = state["content"] or []  # add to content
-        for q in queries.queries:
-            response = self.tavily.search(query=q, max_results=2)
-            for r in response["results"]:
-                content.append(r["content"])
+    async def aresearch_plan_node(self, state: AgentState):
+        queries = await self.llm.ainvoke(
+            self._research_plan_messages(state), node="research_plan", schema=Queries
+        )
+        results = await self.research.asearch_all(queries.queries)
         return {
-            "content": content,
+            "content": self._merge_results(state, results),
             "queries": queries.queries,
             "lnode": "research_plan",
             "count": 1,
         }
 
-    def generation_node(self, state: AgentState):
-        content = "\n\n".join(state["content"] or [])
-        user_message_content = f"{state['task']}\n\nHere is my plan:\n\n{state['plan']}"
-        if state.get("draft") and state["draft"] != "no draft":
-            user_message_content += (
-                f"\n\nHere is my previous draft:\n\n{state['draft']}"
-            )
+    def _writer_passages(self, state):
+        """Research for the writer prompt: passages sent before, then new ones.
+
+        Passages already in an earlier writer prompt are sent again first,
+        unchanged and in the same order, so the prompt keeps its prefix across
+        revisions. The rest of `writer_token_budget` goes to passages that
+        arrived since, ranked against the task, plan and current critique (so
+        what research_critique fetched can reach the writer) and appended in
+        the order they arrived.
+        """
+        sent_ids = state.get("writer_passages") or []
+        pinned, used = [], 0
+        for passage in self.passages.get_many(sent_ids):
+            tokens = count_tokens(passage["content"])
+            if used + tokens > self.writer_token_budget:
+                break
+            pinned.append(passage)
+            used += tokens
+        sent = set(sent_ids)
+        query = f"{state['task']}\n{state['plan']}"
         if state.get("critique") and state["critique"] != "no critique":
-            user_message_content += (
-                f"\n\nHere is the critique I received:\n\n{state['critique']}"
-            )
+            query += f"\n{state['critique']}"
+        fresh = select_passages(
+            [
+                p
+                for p in self.passages.get_many(state["content"])
+                if p["id"] not in sent
+            ],
+            query,
+            self.writer_token_budget - used,
+            keep_order=True,
+        )
+        return pinned + fresh
+
+    def _writer_messages(self, prompt, state, draft, passages):
+        """Writer prompt, stable parts first so provider prefix caches can hit.
 
-        user_message = HumanMessage(content=user_message_content)
+        The prompt constant, task and plan come first and stay the same for
+        the whole essay. Research follows (see `_writer_passages`), and the
+        draft and critique that change on every revision come last.
+        """
         messages = [
-            SystemMessage(content=self.WRITER_PROMPT.format(content=content)),
-            user_message,
+            SystemMessage(content=prompt),
+            HumanMessage(
+                content=f"{state['task']}\n\nHere is my plan:\n\n{state['plan']}"
+            ),
         ]
-        response = self.model.invoke(messages)
-        return {
-            "draft": response.content,
+        if passages:
+            research = "\n\n".join(passage_text(p) for p in passages)
+            messages.append(HumanMessage(content=f"Here is my research:\n\n{research}"))
+        revision = []
+        if draft:
+            revision.append(f"Here is my previous draft:\n\n{draft}")
+        if state.get("critique") and state["critique"] != "no critique":
+            revision.append(f"Here is the critique I received:\n\n{state['critique']}")
+        if revision:
+            messages.append(HumanMessage(content="\n\n".join(revision)))
+        return messages
+
+    def _generation_messages(self, state, passages):
+        draft = state.get("draft")
+        return self._writer_messages(
+            self.WRITER_PROMPT, state, None if draft == "no draft" else draft, passages
+        )
+
+    def _revises(self, state):
+        return (
+            self.editor is not None
+            and state.get("draft") not in (None, "", "no draft")
+            and state.get("critique") not in (None, "", "no critique")
+        )
+
+    def _revision_messages(self, state, passages):
+        return self._writer_messages(
+            self.REVISION_PROMPT, state, numbered_draft(state["draft"]), passages
+        )
+
+    def _apply_edits(self, state, edits):
+        """The edited draft, or None when the draft has to be rewritten."""
+        draft = None if edits is None else self.editor.apply(state["draft"], edits)
+        if draft is None:
+            self.editor.rewrote()
+            print("Warning: draft edits could not be applied; rewriting the draft")
+        return draft
+
+    def _generation_update(self, state, draft, passages):
+        update = {
+            "draft": draft,
+            "writer_passages": [p["id"] for p in passages],
             "revision_number": state.get("revision_number", 1) + 1,
             "lnode": "generate",
             "count": 1,
         }
+        if self.convergence is not None:
+            similarity = self.convergence.similarity(state.get("draft"), draft)
+            converged, saved = self.convergence.check(
+                similarity, update["revision_number"], state["max_revisions"]
+            )
+            update.update(
+                similarity=similarity, converged=converged, llm_calls_saved=saved
+            )
+        return update
 
-    def reflection_node(self, state: AgentState):
-        messages = [
+    def generation_node(self, state: AgentState):
+        passages = self._writer_passages(state)
+        if self._revises(state):
+            try:
+                edits = self.llm.invoke(
+                    self._revision_messages(state, passages),
+                    node="generate",
+                    schema=DraftEdits,
+                )
+            except ValueError:  # unparseable or invalid structured output
+                edits = None
+            if (draft := self._apply_edits(state, edits)) is not None:
+                return self._generation_update(state, draft, passages)
+        response = self.llm.invoke(
+            self._generation_messages(state, passages), node="generate"
+        )
+        return self._generation_update(state, response.content, passages)
+
+    async def ageneration_node(self, state: AgentState):
+        passages = self._writer_passages(state)
+        if self._revises(state):
+            try:
+                edits = await self.llm.ainvoke(
+                    self._revision_messages(state, passages),
+                    node="generate",
+                    schema=DraftEdits,
+                )
+            except ValueError:
+                edits = None
+            if (draft := self._apply_edits(state, edits)) is not None:
+                return self._generation_update(state, draft, passages)
+        response = await self.llm.ainvoke(
+            self._generation_messages(state, passages), node="generate"
+        )
+        return self._generation_update(state, response.content, passages)
+
+    def _reflection_messages(self, state):
+        return [
             SystemMessage(content=self.REFLECTION_PROMPT),
             HumanMessage(content=state["draft"]),
         ]
-        response = self.model.invoke(messages)
+
+    def reflection_node(self, state: AgentState):
+        response = self.llm.invoke(self._reflection_messages(state), node="reflect")
+        return {"critique": response.content, "lnode": "reflect", "count": 1}
+
+    async def areflection_node(self, state: AgentState):
+        response = await self.llm.ainvoke(
+            self._reflection_messages(state), node="reflect"
+        )
+        return {"critique": response.content, "lnode": "reflect", "count": 1}
+
+    def _research_critique_messages(self, state):
+        return [
+            SystemMessage(content=self.RESEARCH_CRITIQUE_PROMPT),
+            HumanMessage(content=state["critique"]),
+        ]
+
+    def research_critique_node(self, state: AgentState):
+        queries = self.llm.invoke(
+            self._research_critique_messages(state),
+            node="research_critique",
+            schema=Queries,
+        )
+        results = self.research.search_all(queries.queries)
         return {
-            "critique": response.content,
-            "lnode": "reflect",
+            "content": self._merge_results(state, results),
+            "lnode": "research_critique",
             "count": 1,
         }
 
-    def research_critique_node(self, state: AgentState):
-        queries = self.model.with_structured_output(Queries).invoke(
-            [
-                SystemMessage(content=self.RESEARCH_CRITIQUE_PROMPT),
-                HumanMessage(content=state["critique"]),
-            ]
-        )
-        content = state["content"] or []
-        for q in queries.queries:
-            response = self.tavily.search(query=q, max_results=2)
-            for r in response["results"]:
-                content.append(r["content"])
+    async def aresearch_critique_node(self, state: AgentState):
+        queries = await self.llm.ainvoke(
+            self._research_critique_messages(state),
+            node="research_critique",
+            schema=Queries,
+        )
+        results = await self.research.asearch_all(queries.queries)
         return {
-            "content": content,
+            "content": self._merge_results(state, results),
             "lnode": "research_critique",
             "count": 1,
         }
 
+    def rate_limit_metrics(self):
+        return {**self.llm_limiter.metrics(), **self.search_limiter.metrics()}
+
     def should_continue(self, state):
-        if state["revision_number"] > state["max_revisions"]:
+        if state["revision_number"] > state["max_revisions"] or state.get("converged"):
             return END
         return "reflect"
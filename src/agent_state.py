@@ -1,21 +1,89 @@
 import operator
-from typing import Annotated, List, TypedDict
+from typing import Annotated, List, Literal, Optional, TypedDict
 
 from pydantic import BaseModel
 
 
+class Passage(TypedDict):
+    id: str
+    content: str
+    url: Optional[str]
+    score: Optional[float]
+
+
+def merge_passage_ids(current, update):
+    """Reducer for `AgentState.content`, a list of `PassagePool` ids.
+
+    A list replaces the ids outright (initial input, copied states). A dict
+    `{"add": [...], "drop": [...]}`, as returned by the research nodes, appends
+    new ids and removes evicted ones, so each step only writes its delta.
+    """
+    if not isinstance(update, dict):
+        return list(update or [])
+    drop = set(update.get("drop", ()))
+    ids = [i for i in current or [] if i not in drop]
+    seen = set(ids)
+    for passage_id in update.get("add", ()):
+        if passage_id not in seen:
+            seen.add(passage_id)
+            ids.append(passage_id)
+    return ids
+
+
+def last_node(current, update):
+    """Reducer for `AgentState.lnode`; parallel branches may both set it in one step."""
+    return update
+
+
 class AgentState(TypedDict):
     task: str
-    lnode: str
+    lnode: Annotated[str, last_node]
     plan: str
     draft: str
     critique: str
-    content: List[str]
+    content: Annotated[List[str], merge_passage_ids]
+    # passage ids already in the writer prompt, in the order they were sent
+    writer_passages: List[str]
     queries: List[str]
     revision_number: int
     max_revisions: int
     count: Annotated[int, operator.add]
+    # set by generate: word-level similarity to the previous draft, whether
+    # the loop stops early on it, and how many model calls that skipped
+    similarity: Optional[float]
+    converged: bool
+    llm_calls_saved: int
+
+
+def new_essay_state(task, max_revisions=2):
+    """Input that starts a new essay thread."""
+    return {
+        "task": task,
+        "max_revisions": max_revisions,
+        "revision_number": 0,
+        "lnode": "",
+        "plan": "no plan",
+        "draft": "no draft",
+        "critique": "no critique",
+        "content": [],
+        "writer_passages": [],
+        "queries": "no queries",
+        "count": 0,
+        "similarity": None,
+        "converged": False,
+        "llm_calls_saved": 0,
+    }
 
 
 class Queries(BaseModel):
     queries: List[str]
+
+
+class ParagraphEdit(BaseModel):
+    paragraph: int  # 1-based number in the previous draft
+    action: Literal["replace", "insert_after", "delete"]
+    text: str = ""
+
+
+class DraftEdits(BaseModel):
+    edits: List[ParagraphEdit]
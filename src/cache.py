@@ -0,0 +1,191 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(*parts):
+    """Content-addressed cache key for any JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class TieredCache:
+    """In-memory LRU cache with an optional SQLite tier underneath.
+
+    Entries expire after `ttl` seconds (never when `ttl` is None). The memory
+    tier holds at most `max_entries` items and the disk tier at most
+    `max_disk_entries`; the least recently used entries are evicted first.
+    Values must be JSON-serializable when a disk tier is configured.
+    """
+
+    def __init__(
+        self,
+        max_entries=1024,
+        ttl=None,
+        path=None,
+        max_disk_entries=100_000,
+        table="cache",
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.table = table
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _expired(self, expires_at):
+        return expires_at is not None and expires_at <= time.time()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if not self._expired(expires_at):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+            if self._conn is not None:
+                value = self._disk_get(key)
+                if value is not None:
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._memory_set(key, expires_at, value)
+            if self._conn is not None:
+                self._disk_set(key, expires_at, value)
+
+    def _memory_set(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _disk_get(self, key):
+        row = self._conn.execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        raw, expires_at = row
+        if self._expired(expires_at):
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute(
+            f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+            (time.time(), key),
+        )
+        self._conn.commit()
+        value = json.loads(raw)
+        self._memory_set(key, expires_at, value)
+        return value
+
+    def _disk_set(self, key, expires_at, value):
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} "
+            "(key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), expires_at, time.time()),
+        )
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if count > self.max_disk_entries:
+            self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+            self.evictions += count - self.max_disk_entries
+        self._conn.commit()
+
+    def purge_expired(self):
+        """Drop expired entries from both tiers."""
+        now = time.time()
+        with self._lock:
+            for key in [
+                k for k, (exp, _) in self._memory.items() if self._expired(exp)
+            ]:
+                del self._memory[key]
+            if self._conn is not None:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)
+                )
+                self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute(f"DELETE FROM {self.table}")
+                self._conn.commit()
+
+    @property
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "evictions": self.evictions,
+            "memory_entries": len(self._memory),
+        }
+
+
+_QUERY_PUNCTUATION = "\"'.,;:!?()[]"
+
+
+def normalize_query(query):
+    """Case-fold and drop stray whitespace/punctuation so near-identical queries share a key."""
+    words = (w.strip(_QUERY_PUNCTUATION) for w in query.casefold().split())
+    return " ".join(w for w in words if w)
+
+
+class CachedSearchClient:
+    """Wraps a search client (e.g. `TavilyClient`) with a `TieredCache`."""
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache if cache is not None else TieredCache()
+
+    def search(self, query, max_results=2, **kwargs):
+        key = make_key("search", normalize_query(query), max_results, kwargs)
+        response = self.cache.get(key)
+        if response is None:
+            response = self.client.search(
+                query=query, max_results=max_results, **kwargs
+            )
+            self.cache.set(key, response)
+        return response
+
+    async def asearch(self, query, max_results=2, **kwargs):
+        key = make_key("search", normalize_query(query), max_results, kwargs)
+        response = self.cache.get(key)
+        if response is None:
+            response = await self.client.asearch(
+                query=query, max_results=max_results, **kwargs
+            )
+            self.cache.set(key, response)
+        return response
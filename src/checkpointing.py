@@ -0,0 +1,180 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+from langgraph.checkpoint.memory import MemorySaver
+
+# offset between the UUID (1582-10-15) and Unix epochs, in seconds
+_UUID_EPOCH_OFFSET = 12219292800
+
+
+def checkpoint_time(checkpoint_id):
+    """Unix time encoded in a LangGraph checkpoint id (a version 6 UUID)."""
+    value = uuid.UUID(checkpoint_id).int
+    ticks = ((value >> 80) << 12) | ((value >> 64) & 0xFFF)
+    return ticks / 1e7 - _UUID_EPOCH_OFFSET
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def make_checkpointer(backend="memory", path="checkpoints.sqlite"):
+    """Build the checkpointer the graph is compiled with.
+
+    `backend` is "memory" (in-process, lost on restart) or "sqlite" (durable,
+    WAL mode, at `path`). Async runs should use `make_async_checkpointer`.
+    """
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "sqlite":
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        saver = SqliteSaver(connect(path))
+        saver.setup()
+        return saver
+    raise ValueError(f"Unknown checkpointer backend: {backend!r}")
+
+
+def next_thread_id(checkpointer):
+    """First numeric thread id above every one stored in `checkpointer`.
+
+    0 for an in-memory saver, which starts empty; None when the checkpointer
+    cannot be queried, in which case callers should use unique ids instead.
+    """
+    if isinstance(checkpointer, MemorySaver):
+        return 0
+    conn = getattr(checkpointer, "conn", None)
+    if not isinstance(conn, sqlite3.Connection):
+        return None
+    (highest,) = conn.execute(
+        "SELECT MAX(CAST(thread_id AS INTEGER)) FROM checkpoints"
+        " WHERE thread_id GLOB '[0-9]*' AND thread_id NOT GLOB '*[^0-9]*'"
+    ).fetchone()
+    return 0 if highest is None else highest + 1
+
+
+async def make_async_checkpointer(path="checkpoints.sqlite"):
+    """aiosqlite-backed checkpointer; must be created inside the running loop."""
+    import aiosqlite
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    # autocommit: an open transaction must not wait on an await while the
+    # loop is blocked in a sync write to the same file (e.g. a PassagePool)
+    conn = await aiosqlite.connect(path, isolation_level=None)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute("PRAGMA synchronous=NORMAL")
+    saver = AsyncSqliteSaver(conn)
+    await saver.setup()
+    return saver
+
+
+class CheckpointCompactor:
+    """Applies retention policies to a SQLite checkpoint database.
+
+    Keeps only the newest `keep_last` checkpoints of every thread and deletes
+    threads whose newest checkpoint is older than `ttl` seconds, along with
+    their pending writes. Research passages in the same database (see
+    `PassagePool`) that no run has added or read for `passage_ttl` seconds
+    are deleted too; it defaults to `ttl`. It uses its own connection, so it
+    works alongside both the sync and the aiosqlite savers. `start()` runs
+    `compact()` every `interval` seconds on a daemon thread. Callables in
+    `on_expire` are called with the ids of the threads each pass deleted.
+    """
+
+    def __init__(
+        self, path, keep_last=None, ttl=None, passage_ttl=None, interval=300.0
+    ):
+        self.path = path
+        self.keep_last = keep_last
+        self.ttl = ttl
+        self.passage_ttl = ttl if passage_ttl is None else passage_ttl
+        self.on_expire = []
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def compact(self):
+        """Run one retention pass and return the number of rows deleted."""
+        conn = connect(self.path)
+        try:
+            deleted = 0
+            expired = []
+            if self.ttl is not None:
+                expired = self._expired_threads(conn)
+                deleted += conn.executemany(
+                    "DELETE FROM checkpoints WHERE thread_id = ?",
+                    [(thread_id,) for thread_id in expired],
+                ).rowcount
+            if self.keep_last is not None:
+                deleted += conn.execute(
+                    "DELETE FROM checkpoints WHERE rowid IN ("
+                    "SELECT rowid FROM (SELECT rowid, ROW_NUMBER() OVER ("
+                    "PARTITION BY thread_id, checkpoint_ns "
+                    "ORDER BY checkpoint_id DESC) AS rn FROM checkpoints) "
+                    "WHERE rn > ?)",
+                    (self.keep_last,),
+                ).rowcount
+            deleted += conn.execute(
+                "DELETE FROM writes WHERE NOT EXISTS ("
+                "SELECT 1 FROM checkpoints c WHERE c.thread_id = writes.thread_id "
+                "AND c.checkpoint_ns = writes.checkpoint_ns "
+                "AND c.checkpoint_id = writes.checkpoint_id)"
+            ).rowcount
+            if self.passage_ttl is not None:
+                deleted += self._expire_passages(conn)
+            conn.commit()
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        if expired:
+            for callback in self.on_expire:
+                callback(expired)
+        return deleted
+
+    def _expired_threads(self, conn):
+        cutoff = time.time() - self.ttl
+        return [
+            thread_id
+            for thread_id, newest in conn.execute(
+                "SELECT thread_id, MAX(checkpoint_id) FROM checkpoints "
+                "GROUP BY thread_id"
+            )
+            if checkpoint_time(newest) < cutoff
+        ]
+
+    def _expire_passages(self, conn):
+        has_pool = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'passages'"
+        ).fetchone()
+        if has_pool is None:
+            return 0
+        return conn.execute(
+            "DELETE FROM passages WHERE last_used < ?",
+            (time.time() - self.passage_ttl,),
+        ).rowcount
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.compact()
+            except sqlite3.Error as exc:
+                print(f"Warning: checkpoint compaction failed: {exc}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="checkpoint-compactor", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -8,10 +8,17 @@ WRITER_PROMPT = """
 You are an essay assistant tasked with writing excellent 5-paragraph essays. \
 Generate the best essay possible for the user's request and the initial outline. \
 If the user provides critique, respond with a revised version of ypur previous attempts. \
+Use the research the user provides where it is relevant.
+"""
 
---------
-
-{content}"""
+REVISION_PROMPT = """
+You are an essay assistant revising an essay in response to critique. \
+The previous draft is given with its paragraphs numbered [1], [2], ... \
+Return only the edits the critique calls for, each naming a paragraph number and \
+an action: "replace" it with new text, "insert_after" it a new paragraph, or \
+"delete" it. Paragraph numbers always refer to the previous draft. \
+Leave out paragraphs that need no change; return no edits if none are needed.
+"""
 
 REFLECTION_PROMPT = """
 You are a teacher grading an essay submission. \
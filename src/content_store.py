@@ -0,0 +1,262 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+PLACEHOLDERS = {"", "no content"}
+
+# Mersenne prime used for the MinHash permutations
+_PRIME = (1 << 61) - 1
+_WORD_RE = re.compile(r"\w+")
+
+
+def count_tokens(text):
+    """Cheap, offline token estimate (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def fingerprint(text):
+    """Exact-duplicate fingerprint, insensitive to case and whitespace."""
+    normalized = " ".join(text.casefold().split())
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def _hash64(value):
+    return int.from_bytes(
+        hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+def make_passage(content, url=None, score=None):
+    return {
+        "id": fingerprint(content),
+        "content": content,
+        "url": url,
+        "score": score,
+    }
+
+
+def passage_text(item):
+    """Text of a passage; also accepts plain strings."""
+    return item["content"] if isinstance(item, dict) else item
+
+
+def format_passage(item):
+    if not isinstance(item, dict) or not item.get("url"):
+        return passage_text(item)
+    score = item.get("score")
+    header = f"[{score:.2f}] {item['url']}" if score is not None else item["url"]
+    return f"{header}\n{item['content']}"
+
+
+class PassagePool:
+    """Content-addressed store of research passages.
+
+    `AgentState.content` only holds passage ids; the passages themselves are
+    stored here once, however many checkpoints refer to them. With `path` the
+    pool is persisted to SQLite (use the checkpoint database so both survive
+    restarts) and at most `max_cached` passages are kept in memory. Each
+    persisted passage records when it was last added or read (at most every
+    `touch_interval` seconds), which `CheckpointCompactor` uses to expire it.
+    """
+
+    def __init__(self, path=None, max_cached=4096, touch_interval=300.0):
+        self.max_cached = max_cached
+        self.touch_interval = touch_interval
+        self._memory = OrderedDict()
+        self._touched = {}  # passage id -> last time written to last_used
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS passages ("
+                "id TEXT PRIMARY KEY, content TEXT NOT NULL, url TEXT, score REAL, "
+                "last_used REAL)"
+            )
+            columns = {
+                row[1] for row in self._conn.execute("PRAGMA table_info(passages)")
+            }
+            if "last_used" not in columns:  # databases written before retention
+                self._conn.execute("ALTER TABLE passages ADD COLUMN last_used REAL")
+                self._conn.execute("UPDATE passages SET last_used = ?", (time.time(),))
+            self._conn.commit()
+
+    def _remember(self, passage):
+        self._memory[passage["id"]] = passage
+        self._memory.move_to_end(passage["id"])
+        if self._conn is not None and len(self._memory) > self.max_cached:
+            evicted, _ = self._memory.popitem(last=False)
+            self._touched.pop(evicted, None)
+
+    def touch(self, passage_ids):
+        """Record that `passage_ids` are still referenced by a checkpoint."""
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._lock:
+            stale = [
+                (now, i)
+                for i in passage_ids or []
+                if now - self._touched.get(i, 0.0) >= self.touch_interval
+            ]
+            if stale:
+                self._conn.executemany(
+                    "UPDATE passages SET last_used = ? WHERE id = ?", stale
+                )
+                self._conn.commit()
+                for _, i in stale:
+                    if i in self._memory:  # forgotten along with the passage
+                        self._touched[i] = now
+
+    def add_many(self, passages):
+        with self._lock:
+            for passage in passages:
+                self._remember(passage)
+            if self._conn is not None and passages:
+                now = time.time()
+                self._conn.executemany(
+                    "INSERT INTO passages (id, content, url, score, last_used) "
+                    "VALUES (:id, :content, :url, :score, :last_used) "
+                    "ON CONFLICT (id) DO UPDATE SET last_used = excluded.last_used",
+                    [{**passage, "last_used": now} for passage in passages],
+                )
+                self._conn.commit()
+                for passage in passages:
+                    self._touched[passage["id"]] = now
+
+    def get(self, passage_id):
+        with self._lock:
+            passage = self._memory.get(passage_id)
+            if passage is None and self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT id, content, url, score FROM passages WHERE id = ?",
+                    (passage_id,),
+                ).fetchone()
+                if row is not None:
+                    passage = dict(zip(("id", "content", "url", "score"), row))
+            if passage is not None:
+                self._remember(passage)
+            return passage
+
+    def get_many(self, passage_ids):
+        """Passages for `passage_ids` in order, skipping ids the pool does not know."""
+        passages = [self.get(i) for i in passage_ids or []]
+        passages = [p for p in passages if p is not None]
+        self.touch([p["id"] for p in passages])
+        return passages
+
+    def __len__(self):
+        if self._conn is not None:
+            with self._lock:
+                return self._conn.execute("SELECT COUNT(*) FROM passages").fetchone()[0]
+        return len(self._memory)
+
+
+class ContentStore:
+    """Merges search results into the passage ids kept in `AgentState.content`.
+
+    Placeholders and exact duplicates are dropped, near-duplicates are detected
+    with MinHash over word shingles, and the total is capped at `token_budget`
+    by evicting the lowest-scoring passages first. New passages are added to
+    `pool`; the research nodes only write the resulting id delta. Signatures
+    of the `max_signatures` most recently used passages are kept for reuse.
+    """
+
+    def __init__(
+        self,
+        pool=None,
+        token_budget=6000,
+        near_dup_threshold=0.8,
+        shingle_size=5,
+        num_perm=64,
+        max_signatures=4096,
+    ):
+        self.pool = pool if pool is not None else PassagePool()
+        self.token_budget = token_budget
+        self.near_dup_threshold = near_dup_threshold
+        self.shingle_size = shingle_size
+        self._perms = [
+            (_hash64(f"a{i}") % (_PRIME - 1) + 1, _hash64(f"b{i}") % _PRIME)
+            for i in range(num_perm)
+        ]
+        self.max_signatures = max_signatures
+        self._signatures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def signature(self, passage):
+        """MinHash signature of a passage, memoized by passage id."""
+        with self._lock:
+            sig = self._signatures.get(passage["id"])
+            if sig is not None:
+                self._signatures.move_to_end(passage["id"])
+                return sig
+        words = _WORD_RE.findall(passage["content"].casefold())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {
+            _hash64(" ".join(words[i : i + size]))
+            for i in range(max(len(words) - size + 1, 1))
+        }
+        sig = tuple(min((a * h + b) % _PRIME for h in shingles) for a, b in self._perms)
+        with self._lock:
+            self._signatures[passage["id"]] = sig
+            if len(self._signatures) > self.max_signatures:
+                self._signatures.popitem(last=False)
+        return sig
+
+    def similarity(self, left, right):
+        sig_l, sig_r = self.signature(left), self.signature(right)
+        return sum(x == y for x, y in zip(sig_l, sig_r)) / len(sig_l)
+
+    def _is_duplicate(self, passage, kept):
+        for other in kept:
+            if other["id"] == passage["id"]:
+                return True
+            if self.similarity(passage, other) >= self.near_dup_threshold:
+                return True
+        return False
+
+    def merge(self, existing_ids, results):
+        """Return the `{"add": [...], "drop": [...]}` id delta for `results`.
+
+        `results` are search results with `content` and optional `url`/`score`
+        keys; the delta is what `merge_passage_ids` applies to the state.
+        """
+        kept = self.pool.get_many(existing_ids)
+        known = {p["id"] for p in kept}
+        added = []
+        for r in results:
+            passage = make_passage(r["content"], r.get("url"), r.get("score"))
+            if passage["content"].strip().casefold() in PLACEHOLDERS:
+                continue
+            if not self._is_duplicate(passage, kept):
+                kept.append(passage)
+                added.append(passage)
+        self.pool.add_many(added)
+        dropped = self._over_budget(kept)
+        return {
+            "add": [p["id"] for p in added if p["id"] not in dropped],
+            # ids the pool no longer has (expired passages) are dropped too
+            "drop": [i for i in existing_ids or [] if i in dropped or i not in known],
+        }
+
+    def _over_budget(self, passages):
+        """Ids to evict so `passages` fit in the token budget."""
+        total = sum(count_tokens(p["content"]) for p in passages)
+        if total <= self.token_budget:
+            return set()
+        # evict lowest score first, newest first among equal scores
+        order = sorted(
+            range(len(passages)),
+            key=lambda i: (passages[i]["score"] or 0.0, -i),
+        )
+        dropped = set()
+        for i in order:
+            if total <= self.token_budget:
+                break
+            total -= count_tokens(passages[i]["content"])
+            dropped.add(passages[i]["id"])
+        return dropped
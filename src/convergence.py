@@ -0,0 +1,49 @@
+import difflib
+import threading
+
+from .instrumentation import record_metrics
+
+# model calls in one reflect -> research_critique -> generate revision
+CALLS_PER_REVISION = 3
+
+
+class ConvergencePolicy:
+    """Ends the revision loop once a new draft barely differs from the last.
+
+    Drafts are compared word by word with difflib's ratio (1.0 = identical).
+    A draft at or above `threshold` is converged and the remaining revisions
+    are skipped; `metrics()` counts the essays stopped early and the model
+    calls that saved.
+    """
+
+    def __init__(self, threshold=0.95):
+        self.threshold = threshold
+        self.converged_essays = 0
+        self.calls_saved = 0
+        self._lock = threading.Lock()
+
+    def similarity(self, previous, draft):
+        if not previous or previous == "no draft":
+            return None
+        matcher = difflib.SequenceMatcher(None, previous.split(), draft.split())
+        return round(matcher.ratio(), 4)
+
+    def check(self, similarity, revision_number, max_revisions):
+        """Return (converged, calls_saved) for a draft just written."""
+        remaining = max_revisions - revision_number + 1
+        if similarity is None or similarity < self.threshold or remaining <= 0:
+            return False, 0
+        saved = remaining * CALLS_PER_REVISION
+        record_metrics(lambda: self._count(saved))
+        return True, saved
+
+    def _count(self, saved):
+        with self._lock:
+            self.converged_essays += 1
+            self.calls_saved += saved
+
+    def metrics(self):
+        return {
+            "converged_essays": self.converged_essays,
+            "llm_calls_saved": self.calls_saved,
+        }
@@ -0,0 +1,72 @@
+"""Tiny stdlib HTTP endpoints: liveness/readiness probes and metrics.
+
+Kept free of third-party imports so `app.py` can listen for probes before
+it loads gradio, langgraph and langchain.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def serve(port, routes, host="127.0.0.1"):
+    """Serve GET `routes` on a daemon thread and return the server.
+
+    `routes` maps a path to a callable returning (status, content_type, body).
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            route = routes.get(self.path)
+            if route is None:
+                self.send_error(404)
+                return
+            status, content_type, body = route()
+            body = body.encode() if isinstance(body, str) else body
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Readiness:
+    """Startup progress for the /readyz probe."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.status = "starting"
+        self.ready_after = None
+
+    def set(self, status):
+        self.status = status
+
+    def mark_ready(self):
+        self.status = "ready"
+        self.ready_after = round(time.monotonic() - self.started, 3)
+
+    def routes(self):
+        """/healthz answers once the process listens; /readyz once it can serve."""
+
+        def healthz():
+            return 200, "text/plain", "ok"
+
+        def readyz():
+            body = json.dumps(
+                {
+                    "status": self.status,
+                    "uptime": round(time.monotonic() - self.started, 3),
+                    "ready_after": self.ready_after,
+                }
+            )
+            return (200 if self.ready_after else 503), "application/json", body
+
+        return {"/healthz": healthz, "/readyz": readyz}
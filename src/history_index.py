@@ -0,0 +1,112 @@
+import threading
+from collections import OrderedDict
+
+
+class HistoryEntry:
+    """Summary of one checkpoint, enough for the step dropdown and lookups."""
+
+    __slots__ = (
+        "config",
+        "checkpoint_id",
+        "thread_id",
+        "step",
+        "count",
+        "lnode",
+        "next",
+        "rev",
+    )
+
+    def __init__(self, state):
+        self.config = state.config
+        self.checkpoint_id = state.config["configurable"]["checkpoint_id"]
+        self.thread_id = state.config["configurable"]["thread_id"]
+        self.step = state.metadata.get("step", 0) if state.metadata else 0
+        self.count = state.values.get("count")
+        self.lnode = state.values.get("lnode")
+        self.next = state.next
+        self.rev = state.values.get("revision_number")
+
+    @property
+    def label(self):
+        return (
+            f"{self.thread_id}:{self.count}:{self.lnode}:{self.next}:"
+            f"{self.rev}:{self.checkpoint_id}"
+        )
+
+
+class HistoryIndex:
+    """Per-thread index over the graph's checkpoint history.
+
+    `sync` reads only the checkpoints written since the previous sync (history
+    is returned newest first, so it stops at the first one already indexed).
+    Lookups by checkpoint id are dict hits and listings are slices, so UI
+    refreshes no longer deserialize a thread's whole history. Compaction
+    deletes a thread's oldest checkpoints first, so when the oldest indexed
+    one is gone the thread is indexed again from scratch. Only the
+    `max_threads` most recently used threads stay indexed; `forget` drops
+    one sooner, e.g. when no session shows it or it has expired.
+    """
+
+    def __init__(self, graph, max_threads=64):
+        self.graph = graph
+        self.max_threads = max_threads
+        # thread_id -> ([HistoryEntry] oldest first, {checkpoint_id: HistoryEntry})
+        self._threads = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _sync(self, thread):
+        thread_id = thread["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id in self._threads:
+                self._threads.move_to_end(thread_id)
+            else:
+                self._threads[thread_id] = ([], {})
+                while len(self._threads) > self.max_threads:
+                    self._threads.popitem(last=False)
+            entries, by_id = self._threads[thread_id]
+            if entries and self.graph.checkpointer.get_tuple(entries[0].config) is None:
+                entries.clear()
+                by_id.clear()
+            new = []
+            for state in self.graph.get_state_history(thread):
+                checkpoint_id = state.config["configurable"]["checkpoint_id"]
+                if checkpoint_id in by_id:
+                    break
+                new.append(HistoryEntry(state))
+            for entry in reversed(new):
+                entries.append(entry)
+                by_id[entry.checkpoint_id] = entry
+            return entries, by_id, len(new)
+
+    def sync(self, thread):
+        """Index checkpoints written since the last sync; returns how many."""
+        return self._sync(thread)[2]
+
+    def get(self, thread, checkpoint_id):
+        """Entry for `checkpoint_id` in `thread`, or None."""
+        _, by_id, _ = self._sync(thread)
+        return by_id.get(checkpoint_id)
+
+    def page(self, thread, offset=0, limit=50):
+        """Entries past the first step, newest first, `limit` at a time."""
+        entries, _, _ = self._sync(thread)
+        listed = []
+        for entry in reversed(entries):
+            if entry.step < 1:
+                continue
+            if offset:
+                offset -= 1
+                continue
+            listed.append(entry)
+            if len(listed) == limit:
+                break
+        return listed
+
+    def count(self, thread):
+        """Number of entries past the first step, as listed by `page`."""
+        entries, _, _ = self._sync(thread)
+        return sum(1 for entry in entries if entry.step >= 1)
+
+    def forget(self, thread):
+        with self._lock:
+            self._threads.pop(thread["configurable"]["thread_id"], None)
@@ -0,0 +1,416 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from langchain_core.runnables import RunnableLambda
+
+from .agent_state import merge_passage_ids
+from .health import serve
+from .rate_limit import completion_tokens, prompt_tokens
+
+# the span of the node running in this context; LangGraph copies the context
+# into node threads and tasks, and ResearchExecutor into its search threads
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# metric updates made by a speculative node run, applied only once committed
+_deferred_metrics = contextvars.ContextVar("deferred_metrics", default=None)
+
+
+class DeferredMetrics:
+    """Metric updates of a speculative run, held until it is committed or discarded.
+
+    Updates recorded after the outcome is settled (a run still going when it
+    is discarded) are applied or dropped right away.
+    """
+
+    def __init__(self):
+        self.outcome = None  # "committed" or "discarded" once settled
+        self._updates = []  # (update, on_discard)
+        self._lock = threading.Lock()
+
+    def add(self, update, on_discard=None):
+        with self._lock:
+            if self.outcome is None:
+                self._updates.append((update, on_discard))
+                return
+        self._run(self.outcome, update, on_discard)
+
+    def commit(self):
+        self._settle("committed")
+
+    def discard(self):
+        self._settle("discarded")
+
+    def _settle(self, outcome):
+        with self._lock:
+            if self.outcome is not None:
+                return
+            self.outcome = outcome
+            updates, self._updates = self._updates, []
+        for update, on_discard in updates:
+            self._run(outcome, update, on_discard)
+
+    @staticmethod
+    def _run(outcome, update, on_discard):
+        if outcome == "committed":
+            update()
+        elif on_discard is not None:
+            on_discard()
+
+
+def record_metrics(update, on_discard=None):
+    """Call `update` now, or hold it back while a speculative run is going on.
+
+    `on_discard` is called instead if that run is discarded.
+    """
+    deferred = _deferred_metrics.get()
+    if deferred is None:
+        update()
+    else:
+        deferred.add(update, on_discard)
+
+
+def run_deferred(deferred, func, *args):
+    """Call `func` with its `record_metrics` updates held in `deferred`."""
+    token = _deferred_metrics.set(deferred)
+    try:
+        return func(*args)
+    finally:
+        _deferred_metrics.reset(token)
+
+
+SPAN_COUNTERS = (
+    "llm.calls",
+    "llm.prompt_tokens",
+    "llm.completion_tokens",
+    # prompt tokens the provider served from its prefix cache
+    "llm.cached_tokens",
+    "search.calls",
+    "search.latency_ms",
+)
+
+
+class Span:
+    """One node execution, shaped like an OpenTelemetry span."""
+
+    def __init__(self, name, trace_id):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.end_time = None
+        self.duration_ms = None
+        self.status = "ok"
+        self.attributes = dict.fromkeys(SPAN_COUNTERS, 0)
+        self._lock = threading.Lock()
+
+    def add(self, key, value):
+        with self._lock:
+            self.attributes[key] += value
+
+    def end(self, status="ok"):
+        self.end_time = time.time()
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        self.status = status
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": dict(self.attributes),
+        }
+
+
+def _content_size(state, update):
+    ids = state.get("content") or []
+    if isinstance(update, dict) and "content" in update:
+        ids = merge_passage_ids(ids, update["content"])
+    return len(ids)
+
+
+class Tracer:
+    """Collects a span per node execution and aggregates them per node.
+
+    Finished spans are kept in memory (the newest `max_spans`) and, when
+    `path` is set, appended to it as JSON lines. `prices` is the
+    (prompt, completion) cost in USD per million tokens; without it spans
+    carry no cost. Callables in `gauges` return extra name -> value metrics,
+    such as the rate limiter's, for the Prometheus text.
+    """
+
+    def __init__(self, max_spans=10_000, path=None, prices=None, gauges=()):
+        self.spans = deque(maxlen=max_spans)
+        self.path = path
+        self.prices = prices
+        self.gauges = list(gauges)
+        # running totals per node, unaffected by the span limit
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def node(self, name, func, afunc=None):
+        """Wrap a node's sync and async implementations so each run is a span."""
+
+        def traced(state, config):
+            span, token = self._start(name, config)
+            try:
+                update = func(state)
+            except Exception:
+                self._finish(span, token, state, None, "error")
+                raise
+            self._finish(span, token, state, update)
+            return update
+
+        async def atraced(state, config):
+            span, token = self._start(name, config)
+            try:
+                update = await afunc(state)
+            except Exception:
+                self._finish(span, token, state, None, "error")
+                raise
+            self._finish(span, token, state, update)
+            return update
+
+        return RunnableLambda(traced, atraced if afunc is not None else None)
+
+    def _start(self, name, config):
+        thread_id = (config or {}).get("configurable", {}).get("thread_id")
+        span = Span(name, None if thread_id is None else str(thread_id))
+        if _deferred_metrics.get() is not None:
+            # run ahead by speculation.Speculator; "committed" or "discarded"
+            # once the user continues or the run is dropped
+            span.attributes["speculation"] = "pending"
+        return span, _current_span.set(span)
+
+    def _finish(self, span, token, state, update, status="ok"):
+        _current_span.reset(token)
+        span.end(status)
+        span.attributes["content.size"] = _content_size(state, update)
+        span.attributes["search.latency_ms"] = round(
+            span.attributes["search.latency_ms"], 3
+        )
+        if self.prices:
+            prompt_price, completion_price = self.prices
+            span.attributes["cost_usd"] = round(
+                span.attributes["llm.prompt_tokens"] * prompt_price / 1e6
+                + span.attributes["llm.completion_tokens"] * completion_price / 1e6,
+                6,
+            )
+        record = span.to_dict()
+        with self._lock:
+            self.spans.append(record)
+        # a speculative run only counts once committed; the span stays listed
+        # either way, with its outcome
+        if "speculation" in span.attributes:
+            record_metrics(
+                lambda: self._settle(record, "committed"),
+                lambda: self._settle(record, "discarded"),
+            )
+        else:
+            self._settle(record)
+
+    def _settle(self, record, speculation=None):
+        """Add a finished span to the node totals (unless discarded) and the log."""
+        attributes = record["attributes"]
+        with self._lock:
+            if speculation is not None:
+                attributes["speculation"] = speculation
+            if speculation != "discarded":
+                totals = self.totals.setdefault(
+                    record["name"],
+                    {"runs": 0, "errors": 0, "seconds": 0.0, "cost_usd": 0.0},
+                )
+                totals["runs"] += 1
+                totals["errors"] += record["status"] != "ok"
+                totals["seconds"] += record["duration_ms"] / 1000
+                totals["cost_usd"] += attributes.get("cost_usd", 0.0)
+                for key in SPAN_COUNTERS:
+                    totals[key] = totals.get(key, 0) + attributes[key]
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def record_llm(self, prompt, completion, cached=0):
+        span = _current_span.get()
+        if span is not None:
+            span.add("llm.calls", 1)
+            span.add("llm.prompt_tokens", prompt)
+            span.add("llm.completion_tokens", completion)
+            span.add("llm.cached_tokens", cached)
+
+    def record_search(self, seconds):
+        span = _current_span.get()
+        if span is not None:
+            span.add("search.calls", 1)
+            span.add("search.latency_ms", round(seconds * 1000, 3))
+
+    def finished(self, thread_id=None):
+        """Finished spans, oldest first, optionally for one thread only."""
+        with self._lock:
+            spans = list(self.spans)
+        if thread_id is None:
+            return spans
+        return [s for s in spans if s["trace_id"] == str(thread_id)]
+
+    def summary(self):
+        """Per node: runs, p50/p95 wall time, mean tokens and prefix cache hits.
+
+        Computed over the kept spans, leaving out speculative runs that were
+        not committed; the hit rate is the share of prompt tokens the provider
+        read from its prefix cache.
+        """
+        by_node = {}
+        for span in self.finished():
+            if span["attributes"].get("speculation", "committed") != "committed":
+                continue
+            by_node.setdefault(span["name"], []).append(span)
+        summary = {}
+        for name, spans in by_node.items():
+            durations = sorted(s["duration_ms"] for s in spans)
+            n = len(spans)
+            prompt = sum(s["attributes"]["llm.prompt_tokens"] for s in spans)
+            cached = sum(s["attributes"]["llm.cached_tokens"] for s in spans)
+            summary[name] = {
+                "runs": n,
+                "p50_ms": durations[n // 2],
+                "p95_ms": durations[min(n - 1, int(n * 0.95))],
+                **{
+                    f"mean_{key}": round(
+                        sum(s["attributes"][key] for s in spans) / n, 1
+                    )
+                    for key in SPAN_COUNTERS
+                },
+                "prompt_cache_hit_rate": round(cached / prompt, 3) if prompt else 0.0,
+            }
+        return summary
+
+    def prometheus(self):
+        """Node totals and gauges in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            totals = {name: dict(t) for name, t in self.totals.items()}
+        metrics = [
+            ("node_runs_total", "runs", "counter"),
+            ("node_errors_total", "errors", "counter"),
+            ("node_duration_seconds_total", "seconds", "counter"),
+            ("node_llm_calls_total", "llm.calls", "counter"),
+            ("node_prompt_tokens_total", "llm.prompt_tokens", "counter"),
+            ("node_completion_tokens_total", "llm.completion_tokens", "counter"),
+            ("node_cached_tokens_total", "llm.cached_tokens", "counter"),
+            ("node_search_calls_total", "search.calls", "counter"),
+            ("node_search_latency_ms_total", "search.latency_ms", "counter"),
+        ]
+        if self.prices:
+            metrics.append(("node_cost_usd_total", "cost_usd", "counter"))
+        for metric, key, kind in metrics:
+            lines.append(f"# TYPE essay_{metric} {kind}")
+            for name, node_totals in sorted(totals.items()):
+                value = round(node_totals[key], 6)
+                lines.append(f'essay_{metric}{{node="{name}"}} {value}')
+        for gauges in self.gauges:
+            for name, value in gauges().items():
+                lines.append(f"# TYPE essay_{name} gauge")
+                lines.append(f"essay_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serve /metrics (Prometheus text) and /spans (JSON) on a daemon thread."""
+
+        def metrics():
+            return 200, "text/plain; version=0.0.4", self.prometheus()
+
+        def spans():
+            return 200, "application/json", json.dumps(self.finished())
+
+        return serve(port, {"/metrics": metrics, "/spans": spans}, host)
+
+
+def _usage(messages, response):
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return prompt_tokens(messages), completion_tokens(response), 0
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    return usage.get("input_tokens", 0), completion_tokens(response), cached
+
+
+class InstrumentedChatModel:
+    """Reports the tokens of every successful model call to `tracer`."""
+
+    def __init__(self, model, tracer):
+        self.model = model
+        self.tracer = tracer
+        self.model_name = getattr(model, "model_name", None)
+
+    def invoke(self, messages, *args, **kwargs):
+        response = self.model.invoke(messages, *args, **kwargs)
+        self.tracer.record_llm(*_usage(messages, response))
+        return response
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        response = await self.model.ainvoke(messages, *args, **kwargs)
+        self.tracer.record_llm(*_usage(messages, response))
+        return response
+
+    def with_structured_output(self, schema):
+        # parsed objects carry no usage; prefer the raw message when offered
+        raw = getattr(self.model, "with_raw_structured_output", None)
+        if raw is not None:
+            return InstrumentedStructuredModel(raw(schema), self.tracer)
+        return InstrumentedChatModel(
+            self.model.with_structured_output(schema), self.tracer
+        )
+
+
+class InstrumentedStructuredModel:
+    """Structured output that reports the usage of the raw model response.
+
+    Wraps a runnable returning LangChain's `include_raw=True` result, a dict
+    with "raw", "parsed" and "parsing_error", and returns the parsed object.
+    """
+
+    def __init__(self, runnable, tracer):
+        self.runnable = runnable
+        self.tracer = tracer
+
+    def _parsed(self, messages, result):
+        self.tracer.record_llm(*_usage(messages, result["raw"]))
+        if result["parsing_error"] is not None:
+            raise result["parsing_error"]
+        if result["parsed"] is None:
+            raise ValueError("the model returned no structured output")
+        return result["parsed"]
+
+    def invoke(self, messages, *args, **kwargs):
+        return self._parsed(messages, self.runnable.invoke(messages, *args, **kwargs))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        result = await self.runnable.ainvoke(messages, *args, **kwargs)
+        return self._parsed(messages, result)
+
+
+class InstrumentedSearchClient:
+    """Reports the latency of every search to `tracer`."""
+
+    def __init__(self, client, tracer):
+        self.client = client
+        self.tracer = tracer
+
+    def search(self, query, **kwargs):
+        start = time.perf_counter()
+        response = self.client.search(query=query, **kwargs)
+        self.tracer.record_search(time.perf_counter() - start)
+        return response
+
+    async def asearch(self, query, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.asearch(query=query, **kwargs)
+        self.tracer.record_search(time.perf_counter() - start)
+        return response
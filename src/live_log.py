@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict, deque
+
+
+def format_update(node, update, max_chars=300):
+    """One-line-per-key summary of a node's state delta.
+
+    Lists are reported by size and long strings are clipped, so a step's entry
+    never repeats the whole accumulated state.
+    """
+    lines = [f"[{node}] done"]
+    for key, value in (update or {}).items():
+        if isinstance(value, list):
+            value = f"{len(value)} items"
+        elif isinstance(value, dict):
+            # e.g. the {"add": [...], "drop": [...]} passage id delta
+            value = ", ".join(
+                f"{k} {len(v)}" if isinstance(v, list) else f"{k} {v}"
+                for k, v in value.items()
+            )
+        else:
+            value = str(value).replace("\n", " ")
+            if len(value) > max_chars:
+                value = value[:max_chars] + "..."
+        lines.append(f"  {key}: {value}")
+    return "\n".join(lines)
+
+
+class LiveLog:
+    """Bounded live output, one ring buffer of step entries per thread.
+
+    Each thread keeps at most `max_entries` entries of at most
+    `max_entry_chars` characters, and only the `max_threads` most recently
+    used threads keep a log, so memory and the payload sent to the UI stay
+    flat no matter how long a session or server runs.
+    """
+
+    separator = "\n------------------\n"
+
+    def __init__(self, max_entries=20, max_entry_chars=4000, max_threads=256):
+        self.max_entries = max_entries
+        self.max_entry_chars = max_entry_chars
+        self.max_threads = max_threads
+        self._logs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _buffer(self, thread_id):
+        with self._lock:
+            buffer = self._logs.get(thread_id)
+            if buffer is None:
+                buffer = self._logs[thread_id] = deque(maxlen=self.max_entries)
+                while len(self._logs) > self.max_threads:
+                    self._logs.popitem(last=False)
+            else:
+                self._logs.move_to_end(thread_id)
+            return buffer
+
+    def _clip(self, text):
+        if len(text) <= self.max_entry_chars:
+            return text
+        # keep the newest text of a long entry, it's what is being streamed
+        return "..." + text[-(self.max_entry_chars - 3) :]
+
+    def add(self, thread_id, text):
+        """Start a new entry."""
+        self._buffer(thread_id).append(self._clip(text))
+
+    def extend(self, thread_id, text):
+        """Append streamed text to the newest entry."""
+        buffer = self._buffer(thread_id)
+        if not buffer:
+            buffer.append("")
+        buffer[-1] = self._clip(buffer[-1] + text)
+
+    def render(self, thread_id):
+        with self._lock:
+            buffer = tuple(self._logs.get(thread_id, ()))
+        return self.separator.join(buffer)
+
+    def clear(self, thread_id):
+        with self._lock:
+            self._logs.pop(thread_id, None)
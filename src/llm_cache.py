@@ -0,0 +1,70 @@
+from langchain_core.messages import AIMessage
+
+from .cache import TieredCache, make_key
+
+
+def _model_name(model):
+    return getattr(model, "model_name", None) or getattr(model, "model", None)
+
+
+class CachedChatModel:
+    """Wraps a chat model so repeated prompts are answered from a `TieredCache`.
+
+    Keys cover the model name, the structured output schema (if any) and every
+    message's type and content, which includes the system prompt constant.
+    Plain responses are stored as their text; structured responses are stored
+    with `model_dump()` and rebuilt with the same schema on a hit. Nodes named
+    in `bypass` always call the model and never touch the cache.
+    """
+
+    def __init__(self, model, cache=None, bypass=()):
+        self.model = model
+        self.cache = cache if cache is not None else TieredCache()
+        self.bypass = set(bypass)
+
+    def key(self, messages, schema=None):
+        return make_key(
+            "llm",
+            _model_name(self.model),
+            schema.__name__ if schema is not None else None,
+            [(m.type, m.content) for m in messages],
+        )
+
+    def _runnable(self, schema):
+        if schema is None:
+            return self.model
+        return self.model.with_structured_output(schema)
+
+    def _lookup(self, key, schema):
+        cached = self.cache.get(key)
+        if cached is None:
+            return None
+        if schema is not None:
+            return schema.model_validate(cached)
+        return AIMessage(content=cached["content"])
+
+    def _store(self, key, schema, response):
+        if schema is not None:
+            self.cache.set(key, response.model_dump())
+        else:
+            self.cache.set(key, {"content": response.content})
+
+    def invoke(self, messages, node=None, schema=None):
+        if node in self.bypass:
+            return self._runnable(schema).invoke(messages)
+        key = self.key(messages, schema)
+        response = self._lookup(key, schema)
+        if response is None:
+            response = self._runnable(schema).invoke(messages)
+            self._store(key, schema, response)
+        return response
+
+    async def ainvoke(self, messages, node=None, schema=None):
+        if node in self.bypass:
+            return await self._runnable(schema).ainvoke(messages)
+        key = self.key(messages, schema)
+        response = self._lookup(key, schema)
+        if response is None:
+            response = await self._runnable(schema).ainvoke(messages)
+            self._store(key, schema, response)
+        return response
@@ -0,0 +1,228 @@
+"""Pluggable model and search providers for `Agent`.
+
+A model provider is anything chat-model shaped: `model_name`, `invoke`,
+`ainvoke` and `with_structured_output(schema)`. A search provider has
+`search(query, **kwargs)` and an `asearch` coroutine. The built-in ones
+create their clients on first use, so an `Agent` can be constructed
+without credentials or network access, and share pooled HTTP clients
+across every `Agent` in the process.
+"""
+
+import os
+import threading
+
+import httpx
+from langchain_core.messages import AIMessage
+
+OPENROUTER_URL = "https://openrouter.ai/api/v1"
+
+_lock = threading.Lock()
+_shared = {}
+
+
+def _shared_client(key, factory):
+    with _lock:
+        if key not in _shared:
+            _shared[key] = factory()
+        return _shared[key]
+
+
+def _limits():
+    return httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+
+def shared_http_client():
+    """Process-wide pooled `httpx.Client`, reused by every provider."""
+    return _shared_client(
+        "http", lambda: httpx.Client(limits=_limits(), timeout=httpx.Timeout(60.0))
+    )
+
+
+def shared_async_http_client():
+    """Process-wide pooled `httpx.AsyncClient`.
+
+    Its connections belong to the event loop that opened them, so async runs
+    should share one long-lived loop (as `batch.py --async` does).
+    """
+    return _shared_client(
+        "async_http",
+        lambda: httpx.AsyncClient(limits=_limits(), timeout=httpx.Timeout(60.0)),
+    )
+
+
+class OpenAICompatibleModel:
+    """`ChatOpenAI` against an OpenAI-compatible API (OpenRouter by default).
+
+    The client is built on first use, with `max_retries=0` because retries
+    happen in the rate limiter, on the shared pooled HTTP clients.
+    """
+
+    def __init__(self, model="openai/gpt-4o", base_url=OPENROUTER_URL, api_key=None):
+        self.model_name = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                from langchain_openai import ChatOpenAI
+
+                self._client = ChatOpenAI(
+                    model=self.model_name,
+                    temperature=0,
+                    base_url=self.base_url,
+                    api_key=self.api_key,
+                    max_retries=0,
+                    http_client=shared_http_client(),
+                    http_async_client=shared_async_http_client(),
+                )
+            return self._client
+
+    def invoke(self, messages, *args, **kwargs):
+        return self.client.invoke(messages, *args, **kwargs)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return await self.client.ainvoke(messages, *args, **kwargs)
+
+    def with_structured_output(self, schema):
+        return self.client.with_structured_output(schema)
+
+    def with_raw_structured_output(self, schema):
+        """Structured output that also returns the raw message, for its usage."""
+        return self.client.with_structured_output(schema, include_raw=True)
+
+
+_OLLAMA_ROLES = {"system": "system", "human": "user", "ai": "assistant"}
+
+
+def _ollama_messages(messages):
+    return [{"role": _OLLAMA_ROLES[m.type], "content": m.content} for m in messages]
+
+
+def _ollama_message(response):
+    return AIMessage(
+        content=response.message.content,
+        usage_metadata={
+            "input_tokens": response.prompt_eval_count or 0,
+            "output_tokens": response.eval_count or 0,
+            "total_tokens": (response.prompt_eval_count or 0)
+            + (response.eval_count or 0),
+        },
+    )
+
+
+class OllamaModel:
+    """A local model served by Ollama, through the `ollama` package.
+
+    Structured output asks Ollama to constrain its reply to the schema's JSON
+    schema and validates the result with the same pydantic model.
+    """
+
+    def __init__(self, model="llama3.2", host=None, options=None):
+        self.model_name = model
+        self.host = host or os.getenv("OLLAMA_HOST")
+        self.options = {"temperature": 0, **(options or {})}
+        self._clients = None
+        self._lock = threading.Lock()
+
+    @property
+    def clients(self):
+        with self._lock:
+            if self._clients is None:
+                try:
+                    import ollama
+                except ImportError as exc:
+                    raise ImportError(
+                        "OllamaModel requires the ollama package: pip install ollama"
+                    ) from exc
+                self._clients = (
+                    ollama.Client(host=self.host),
+                    ollama.AsyncClient(host=self.host),
+                )
+            return self._clients
+
+    def chat(self, messages, format=None):
+        return self.clients[0].chat(
+            model=self.model_name,
+            messages=_ollama_messages(messages),
+            format=format,
+            options=self.options,
+        )
+
+    async def achat(self, messages, format=None):
+        return await self.clients[1].chat(
+            model=self.model_name,
+            messages=_ollama_messages(messages),
+            format=format,
+            options=self.options,
+        )
+
+    def invoke(self, messages, *args, **kwargs):
+        return _ollama_message(self.chat(messages))
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        return _ollama_message(await self.achat(messages))
+
+    def with_structured_output(self, schema):
+        return OllamaStructuredModel(self, schema)
+
+
+class OllamaStructuredModel:
+    def __init__(self, model, schema):
+        self.model = model
+        self.schema = schema
+
+    def invoke(self, messages, *args, **kwargs):
+        response = self.model.chat(messages, format=self.schema.model_json_schema())
+        return self.schema.model_validate_json(response.message.content)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        response = await self.model.achat(
+            messages, format=self.schema.model_json_schema()
+        )
+        return self.schema.model_validate_json(response.message.content)
+
+
+def model_from_name(name):
+    """Model provider for a name such as "openai/gpt-4o" or "ollama:llama3.2".
+
+    Names without a prefix go to OpenRouter.
+    """
+    if name.startswith("ollama:"):
+        return OllamaModel(name.removeprefix("ollama:"))
+    return OpenAICompatibleModel(name.removeprefix("openrouter:"))
+
+
+class TavilySearch:
+    """Tavily search with one shared sync and async client per API key."""
+
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+
+    def _key(self):
+        return self.api_key or os.environ["TAVILY_API_KEY"]
+
+    @property
+    def client(self):
+        from tavily import TavilyClient
+
+        key = self._key()
+        return _shared_client(("tavily", key), lambda: TavilyClient(api_key=key))
+
+    @property
+    def async_client(self):
+        from tavily import AsyncTavilyClient
+
+        key = self._key()
+        return _shared_client(
+            ("async_tavily", key), lambda: AsyncTavilyClient(api_key=key)
+        )
+
+    def search(self, query, **kwargs):
+        return self.client.search(query=query, **kwargs)
+
+    async def asearch(self, query, **kwargs):
+        return await self.async_client.search(query=query, **kwargs)
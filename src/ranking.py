@@ -0,0 +1,67 @@
+import math
+import re
+from collections import Counter
+
+from .content_store import count_tokens, passage_text
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class BM25:
+    """Okapi BM25 over a small, in-memory list of documents."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_terms = [Counter(tokenize(doc)) for doc in documents]
+        self.doc_lengths = [sum(terms.values()) for terms in self.doc_terms]
+        self.avg_length = sum(self.doc_lengths) / len(documents) if documents else 0
+        df = Counter(term for terms in self.doc_terms for term in terms)
+        n = len(documents)
+        self.idf = {
+            term: math.log(1 + (n - freq + 0.5) / (freq + 0.5))
+            for term, freq in df.items()
+        }
+
+    def scores(self, query):
+        query_terms = Counter(tokenize(query))
+        results = []
+        for terms, length in zip(self.doc_terms, self.doc_lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / (self.avg_length or 1))
+            score = 0.0
+            for term, qf in query_terms.items():
+                tf = terms.get(term)
+                if tf:
+                    score += qf * self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            results.append(score)
+        return results
+
+
+def select_passages(passages, query, token_budget, keep_order=False):
+    """Pick the passages most relevant to `query` that fit in `token_budget`.
+
+    Passages are ranked by BM25 against the query and packed greedily, most
+    relevant first; passages that would overflow the budget are skipped so a
+    smaller, lower-ranked one can still fit. The selection is returned most
+    relevant first, or in its input order with `keep_order`.
+    """
+    passages = list(passages or [])
+    if not passages:
+        return []
+    texts = [passage_text(p) for p in passages]
+    scores = BM25(texts).scores(query)
+    ranked = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+    selected, used = [], 0
+    for i in ranked:
+        tokens = count_tokens(texts[i])
+        if used + tokens > token_budget:
+            continue
+        selected.append(i)
+        used += tokens
+    if keep_order:
+        selected.sort()
+    return [passages[i] for i in selected]
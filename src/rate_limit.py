@@ -0,0 +1,382 @@
+import asyncio
+import random
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from .content_store import count_tokens
+
+# statuses that mean "slow down"; anything else in 5xx is retried without
+# shrinking the concurrency limit
+OVERLOAD_STATUSES = {429, 503, 529}
+
+# distinct classes before Python 3.11, aliases of TimeoutError since
+TIMEOUT_ERRORS = (TimeoutError, asyncio.TimeoutError, FutureTimeoutError)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit, burst=None):
+        """`limit` per minute; `burst` defaults to one second's worth (at least 1)."""
+        return cls(limit / 60.0, capacity=burst or max(limit / 60.0, 1))
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def _take(self, tokens):
+        """Take `tokens` if available; otherwise return how long to wait."""
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available, then take them."""
+        while wait := self._take(tokens):
+            time.sleep(wait)
+
+    async def aacquire(self, tokens=1):
+        """`acquire` that sleeps on the event loop instead of blocking it."""
+        while wait := self._take(tokens):
+            await asyncio.sleep(wait)
+
+    def debit(self, tokens):
+        """Take `tokens` without waiting; the balance may go negative."""
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+    @property
+    def available(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class AdaptiveConcurrency:
+    """AIMD cap on in-flight calls.
+
+    Each success raises the limit by `1 / limit` (about +1 per limit's worth
+    of calls); an overload response multiplies it by `backoff`. Only calls
+    started after the last decrease can shrink the limit again, so one burst
+    of 429s counts as a single signal.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64, backoff=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.in_flight = 0
+        self._decreased = 0.0
+        self._cond = threading.Condition()
+
+    def _try_enter(self):
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return time.monotonic()
+            return None
+
+    def enter(self):
+        """Wait for a slot; returns the start time to pass to `exit`."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+            return time.monotonic()
+
+    async def aenter(self):
+        while (started := self._try_enter()) is None:
+            await asyncio.sleep(0.01)
+        return started
+
+    def exit(self, started, overloaded=False):
+        with self._cond:
+            self.in_flight -= 1
+            if not overloaded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif started >= self._decreased:
+                self.limit = max(self.minimum, self.limit * self.backoff)
+                self._decreased = time.monotonic()
+            self._cond.notify_all()
+
+    def release(self):
+        """Give a slot back without a verdict, e.g. after a cancelled call."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+
+class RetryBudget:
+    """Caps retries at `ratio` of requests, plus a reserve of `capacity`.
+
+    Keeps a provider outage from turning into a retry storm: once the
+    reserve is spent, failures are raised instead of retried.
+    """
+
+    def __init__(self, ratio=0.2, capacity=20):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.balance = float(capacity)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.balance = min(self.capacity, self.balance + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.balance < 1:
+                return False
+            self.balance -= 1
+            return True
+
+
+def _status_code(exc):
+    # provider errors imply their package is loaded; never import one to check
+    tavily_errors = sys.modules.get("tavily.errors")
+    if tavily_errors is not None and isinstance(
+        exc, tavily_errors.UsageLimitExceededError
+    ):
+        return 429
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def classify(exc):
+    """Return (retryable, overloaded) for an exception raised by a provider call."""
+    status = _status_code(exc)
+    if status is not None:
+        return status in OVERLOAD_STATUSES or status >= 500, status in OVERLOAD_STATUSES
+    transient = (*TIMEOUT_ERRORS, ConnectionError)
+    openai = sys.modules.get("openai")
+    if openai is not None:
+        transient += (openai.APIConnectionError,)
+    if isinstance(exc, transient):
+        # timeouts are often the first sign of an overloaded upstream
+        return True, True
+    return False, False
+
+
+class ProviderLimiter:
+    """Shared gate for every call to one provider.
+
+    A call waits for the request bucket (and the token bucket when `cost` is
+    given), then for a slot under the AIMD concurrency limit. 429/5xx and
+    connection errors are retried with full-jitter exponential backoff (or
+    the server's Retry-After) while the retry budget allows it.
+    """
+
+    def __init__(
+        self,
+        name,
+        requests=None,
+        tokens=None,
+        concurrency=None,
+        budget=None,
+        max_attempts=5,
+        base_delay=0.5,
+        max_delay=30.0,
+    ):
+        self.name = name
+        self.requests = requests
+        self.tokens = tokens
+        self.concurrency = concurrency or AdaptiveConcurrency()
+        self.budget = budget or RetryBudget()
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.counts = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, rpm=None, tpm=None, concurrency=8, max_concurrency=64):
+        """OpenRouter-style limits: requests and tokens per minute."""
+        return cls(
+            "llm",
+            requests=TokenBucket.per_minute(rpm) if rpm else None,
+            tokens=TokenBucket.per_minute(tpm, burst=tpm) if tpm else None,
+            concurrency=AdaptiveConcurrency(concurrency, maximum=max_concurrency),
+        )
+
+    @classmethod
+    def for_search(cls, rps=None, concurrency=8, max_concurrency=32):
+        """Tavily-style limits: requests per second."""
+        return cls(
+            "search",
+            requests=TokenBucket(rps) if rps else None,
+            concurrency=AdaptiveConcurrency(concurrency, maximum=max_concurrency),
+        )
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def _delay(self, attempt, exc):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def _should_retry(self, attempt, started, exc):
+        """Release the concurrency slot and decide whether to try again."""
+        retryable, overloaded = classify(exc)
+        self.concurrency.exit(started, overloaded=overloaded)
+        if overloaded:
+            self._count("throttled")
+        if retryable and attempt + 1 < self.max_attempts and self.budget.withdraw():
+            self._count("retries")
+            return True
+        self._count("failures")
+        return False
+
+    def call(self, fn, *args, cost=0, **kwargs):
+        self._count("calls")
+        self.budget.deposit()
+        for attempt in range(self.max_attempts):
+            if self.requests is not None:
+                self.requests.acquire()
+            if self.tokens is not None and cost:
+                self.tokens.acquire(cost)
+            started = self.concurrency.enter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as exc:
+                if not self._should_retry(attempt, started, exc):
+                    raise
+                time.sleep(self._delay(attempt, exc))
+            except BaseException:
+                self.concurrency.release()
+                raise
+            else:
+                self.concurrency.exit(started)
+                return result
+
+    async def acall(self, fn, *args, cost=0, **kwargs):
+        self._count("calls")
+        self.budget.deposit()
+        for attempt in range(self.max_attempts):
+            if self.requests is not None:
+                await self.requests.aacquire()
+            if self.tokens is not None and cost:
+                await self.tokens.aacquire(cost)
+            started = await self.concurrency.aenter()
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as exc:
+                if not self._should_retry(attempt, started, exc):
+                    raise
+                await asyncio.sleep(self._delay(attempt, exc))
+            except BaseException:
+                # cancelled, e.g. by the wait_for around each search
+                self.concurrency.release()
+                raise
+            else:
+                self.concurrency.exit(started)
+                return result
+
+    def charge(self, tokens):
+        """Count tokens only known after the call, e.g. the completion."""
+        if self.tokens is not None and tokens:
+            self.tokens.debit(tokens)
+
+    def metrics(self):
+        with self._lock:
+            metrics = {f"{self.name}_{k}": v for k, v in self.counts.items()}
+        metrics[f"{self.name}_concurrency_limit"] = round(self.concurrency.limit, 2)
+        metrics[f"{self.name}_in_flight"] = self.concurrency.in_flight
+        metrics[f"{self.name}_retry_budget"] = round(self.budget.balance, 2)
+        if self.requests is not None:
+            metrics[f"{self.name}_requests_per_second"] = self.requests.rate
+            metrics[f"{self.name}_requests_available"] = round(
+                self.requests.available, 2
+            )
+        if self.tokens is not None:
+            metrics[f"{self.name}_tokens_per_minute"] = round(self.tokens.rate * 60)
+            metrics[f"{self.name}_tokens_available"] = round(self.tokens.available)
+        return metrics
+
+
+def prompt_tokens(messages):
+    """Estimated prompt size of `messages`."""
+    return sum(count_tokens(str(m.content)) for m in messages)
+
+
+def completion_tokens(response):
+    """Completion size from usage_metadata, or estimated from the response."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("output_tokens", 0)
+    if hasattr(response, "model_dump_json"):
+        return count_tokens(response.model_dump_json())
+    return count_tokens(str(getattr(response, "content", "")))
+
+
+class RateLimitedChatModel:
+    """Sends every call to the wrapped chat model through a `ProviderLimiter`."""
+
+    def __init__(self, model, limiter):
+        self.model = model
+        self.limiter = limiter
+        self.model_name = getattr(model, "model_name", None)
+
+    def invoke(self, messages, *args, **kwargs):
+        response = self.limiter.call(
+            self.model.invoke, messages, *args, cost=prompt_tokens(messages), **kwargs
+        )
+        self.limiter.charge(completion_tokens(response))
+        return response
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        response = await self.limiter.acall(
+            self.model.ainvoke, messages, *args, cost=prompt_tokens(messages), **kwargs
+        )
+        self.limiter.charge(completion_tokens(response))
+        return response
+
+    def with_structured_output(self, schema):
+        return RateLimitedChatModel(
+            self.model.with_structured_output(schema), self.limiter
+        )
+
+
+class RateLimitedSearchClient:
+    """Sends every search through a `ProviderLimiter`."""
+
+    def __init__(self, client, limiter):
+        self.client = client
+        self.limiter = limiter
+
+    def search(self, query, **kwargs):
+        return self.limiter.call(self.client.search, query=query, **kwargs)
+
+    async def asearch(self, query, **kwargs):
+        return await self.limiter.acall(self.client.asearch, query=query, **kwargs)
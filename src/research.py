@@ -0,0 +1,112 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+
+class SearchAdapter:
+    """Gives a sync search client an `asearch` coroutine.
+
+    Uses `async_client` (e.g. `AsyncTavilyClient`) when there is one and
+    otherwise runs the sync client in a worker thread.
+    """
+
+    def __init__(self, client, async_client=None):
+        self.client = client
+        self.async_client = async_client
+
+    def search(self, query, **kwargs):
+        return self.client.search(query=query, **kwargs)
+
+    async def asearch(self, query, **kwargs):
+        if self.async_client is not None:
+            return await self.async_client.search(query=query, **kwargs)
+        return await asyncio.to_thread(self.client.search, query=query, **kwargs)
+
+
+class ResearchExecutor:
+    """Runs the search queries of a `Queries` result concurrently.
+
+    Results come back in query order. A query that fails or does not finish
+    within `timeout` seconds of starting contributes no results instead of
+    failing the node; time spent queued for a worker does not count.
+    """
+
+    def __init__(self, client, max_workers=4, timeout=20.0, max_results=2):
+        self.client = client
+        self.timeout = timeout
+        self.max_results = max_results
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="research"
+        )
+
+    def _search(self, query, started):
+        started.append(time.monotonic())
+        return self.client.search(query=query, max_results=self.max_results)
+
+    def _result(self, future, started):
+        """Wait for `future` until `timeout` seconds after its search started."""
+        while True:
+            running = bool(started)
+            if running:
+                remaining = max(started[0] + self.timeout - time.monotonic(), 0)
+            else:
+                remaining = self.timeout  # queued; its clock has not started
+            try:
+                return future.result(timeout=remaining)
+            except FutureTimeoutError:
+                if running:
+                    raise
+
+    def search_all(self, queries):
+        """Return one list of search results per query, in the order given."""
+        # copy the caller's context so searches count towards its node's span
+        searches = []
+        for query in queries:
+            started = []
+            future = self._pool.submit(
+                contextvars.copy_context().run, self._search, query, started
+            )
+            searches.append((future, started))
+        results = []
+        for query, (future, started) in zip(queries, searches):
+            try:
+                response = self._result(future, started)
+            except FutureTimeoutError:
+                future.cancel()
+                print(f"Warning: search timed out after {self.timeout}s: {query!r}")
+                results.append([])
+            except Exception as exc:
+                print(f"Warning: search failed for {query!r}: {exc}")
+                results.append([])
+            else:
+                results.append(response.get("results", []))
+        return results
+
+    async def _asearch(self, query):
+        response = await asyncio.wait_for(
+            self.client.asearch(query=query, max_results=self.max_results),
+            self.timeout,
+        )
+        return response.get("results", [])
+
+    async def asearch_all(self, queries):
+        """Async `search_all`: one coroutine per query on the running loop."""
+        responses = await asyncio.gather(
+            *(self._asearch(q) for q in queries), return_exceptions=True
+        )
+        results = []
+        for query, response in zip(queries, responses):
+            if isinstance(response, asyncio.TimeoutError):
+                print(f"Warning: search timed out after {self.timeout}s: {query!r}")
+                results.append([])
+            elif isinstance(response, Exception):
+                print(f"Warning: search failed for {query!r}: {response}")
+                results.append([])
+            else:
+                results.append(response)
+        return results
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
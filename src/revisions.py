@@ -0,0 +1,82 @@
+import re
+import threading
+
+from .instrumentation import record_metrics
+
+_BLANK_LINES = re.compile(r"\n\s*\n")
+
+
+def split_paragraphs(draft):
+    return [p.strip() for p in _BLANK_LINES.split(draft) if p.strip()]
+
+
+def numbered_draft(draft):
+    """The draft with each paragraph prefixed by its number, as "[n] ..."."""
+    return "\n\n".join(
+        f"[{n}] {paragraph}"
+        for n, paragraph in enumerate(split_paragraphs(draft), start=1)
+    )
+
+
+class DraftEditor:
+    """Applies a `DraftEdits` response to the previous draft.
+
+    Edits address paragraphs by their number in the previous draft, so they
+    are applied without renumbering. A set that cannot be applied as a whole
+    (an unknown paragraph, two edits to one paragraph, an empty replacement)
+    yields None and the caller rewrites the draft instead. `metrics()` counts
+    both outcomes and the paragraphs kept as they were.
+    """
+
+    def __init__(self):
+        self.edited = 0
+        self.rewrites = 0
+        self.paragraphs_kept = 0
+        self._lock = threading.Lock()
+
+    def apply(self, draft, edits):
+        paragraphs = split_paragraphs(draft)
+        replaced = {}
+        inserted = {}
+        for edit in edits.edits:
+            index = edit.paragraph - 1
+            text = edit.text.strip()
+            if not 0 <= index < len(paragraphs):
+                return None
+            if edit.action == "insert_after":
+                if not text:
+                    return None
+                inserted.setdefault(index, []).append(text)
+                continue
+            if index in replaced or (edit.action == "replace" and not text):
+                return None
+            replaced[index] = text if edit.action == "replace" else None
+        revised = []
+        for index, paragraph in enumerate(paragraphs):
+            paragraph = replaced.get(index, paragraph)
+            if paragraph is not None:
+                revised.append(paragraph)
+            revised.extend(inserted.get(index, ()))
+        if not revised:
+            return None
+        record_metrics(lambda: self._count_edit(len(paragraphs) - len(replaced)))
+        return "\n\n".join(revised)
+
+    def _count_edit(self, kept):
+        with self._lock:
+            self.edited += 1
+            self.paragraphs_kept += kept
+
+    def rewrote(self):
+        record_metrics(self._count_rewrite)
+
+    def _count_rewrite(self):
+        with self._lock:
+            self.rewrites += 1
+
+    def metrics(self):
+        return {
+            "edited_revisions": self.edited,
+            "rewritten_revisions": self.rewrites,
+            "paragraphs_kept": self.paragraphs_kept,
+        }
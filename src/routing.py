@@ -0,0 +1,126 @@
+import asyncio
+import contextvars
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from .rate_limit import TIMEOUT_ERRORS
+
+# nodes whose output is short or advisory: search queries and the critique
+FAST_NODES = ("research_plan", "research_critique", "reflect")
+
+
+def is_timeout(exc):
+    if isinstance(exc, (*TIMEOUT_ERRORS, httpx.TimeoutException)):
+        return True
+    # an openai error implies openai is loaded; never import it just to check
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(exc, openai.APITimeoutError)
+
+
+# runs bounded sync calls; threads start on demand, and waiting in the queue
+# would count against the timeout, so the cap is generous
+_pool = ThreadPoolExecutor(max_workers=256, thread_name_prefix="model")
+
+
+class FallbackCounter:
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self):
+        with self._lock:
+            self.count += 1
+
+
+class FallbackChatModel:
+    """Calls `primary`, and `fallback` when it times out.
+
+    A call counts as timed out when it raises a timeout error or has not
+    answered within `timeout` seconds. Sync calls run on a worker thread so
+    the wait can be bounded; an abandoned call finishes in the background.
+    """
+
+    def __init__(self, primary, fallback, timeout=15.0, counter=None, names=None):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = timeout
+        self.counter = counter if counter is not None else FallbackCounter()
+        # structured-output runnables have no model_name of their own
+        self.names = names or (
+            getattr(primary, "model_name", None),
+            getattr(fallback, "model_name", None),
+        )
+        self.model_name = self.names[0]
+
+    def _fall_back(self):
+        self.counter.add()
+        print(
+            f"Warning: {self.names[0]} did not answer within {self.timeout}s;"
+            f" using {self.names[1]}"
+        )
+
+    def invoke(self, messages, *args, **kwargs):
+        # copy the context so streaming callbacks and spans still see the node
+        future = _pool.submit(
+            contextvars.copy_context().run,
+            self.primary.invoke,
+            messages,
+            *args,
+            **kwargs,
+        )
+        try:
+            return future.result(timeout=self.timeout)
+        except Exception as exc:
+            if not is_timeout(exc):
+                raise
+            self._fall_back()
+            return self.fallback.invoke(messages, *args, **kwargs)
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        try:
+            return await asyncio.wait_for(
+                self.primary.ainvoke(messages, *args, **kwargs), self.timeout
+            )
+        except Exception as exc:
+            if not is_timeout(exc):
+                raise
+            self._fall_back()
+            return await self.fallback.ainvoke(messages, *args, **kwargs)
+
+    def with_structured_output(self, schema):
+        return FallbackChatModel(
+            self.primary.with_structured_output(schema),
+            self.fallback.with_structured_output(schema),
+            self.timeout,
+            self.counter,
+            self.names,
+        )
+
+
+class ModelRouter:
+    """Sends each node's model calls to the chat model configured for it.
+
+    `models` maps node names to wrapped models with the
+    `invoke(messages, node=..., schema=...)` signature of `CachedChatModel`;
+    nodes without an entry use `default`.
+    """
+
+    def __init__(self, default, models=None, fallbacks=None):
+        self.default = default
+        self.models = dict(models or {})
+        self.fallbacks = fallbacks or FallbackCounter()
+
+    def for_node(self, node):
+        return self.models.get(node, self.default)
+
+    def invoke(self, messages, node=None, schema=None):
+        return self.for_node(node).invoke(messages, node=node, schema=schema)
+
+    async def ainvoke(self, messages, node=None, schema=None):
+        return await self.for_node(node).ainvoke(messages, node=node, schema=schema)
+
+    def metrics(self):
+        return {"llm_fallbacks": self.fallbacks.count}
@@ -0,0 +1,42 @@
+import itertools
+import threading
+import uuid
+
+
+class Session:
+    """Per-browser-session view of the agent: its threads and the current one.
+
+    Held in a `gr.State`, so every connected user gets an independent copy
+    while all of them share the one compiled graph.
+    """
+
+    def __init__(self):
+        self.thread_id = -1
+        self.threads = []
+        self.iterations = {}
+        self.timing = ""
+
+    @property
+    def thread(self):
+        return {"configurable": {"thread_id": str(self.thread_id)}}
+
+    def switch(self, thread_id):
+        self.thread_id = thread_id
+
+
+class ThreadIds:
+    """Hands out thread ids that are unique across all sessions.
+
+    Ids count up from `start`, which should lie above every thread already
+    in the checkpointer; with `start=None` they are random hex strings.
+    """
+
+    def __init__(self, start=0):
+        self._counter = None if start is None else itertools.count(start)
+        self._lock = threading.Lock()
+
+    def next(self):
+        if self._counter is None:
+            return uuid.uuid4().hex
+        with self._lock:
+            return next(self._counter)
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+
+from .content_store import format_passage, passage_text
+
+RULE = "=" * 80
+
+
+def _preview(text, chars=150):
+    return text[:chars].replace("\n", " ")
+
+
+class SnapshotRenderer:
+    """Renders a thread's checkpoints for the State Snapshots tab, a page at a time.
+
+    Checkpoints never change once written, so each summary is rendered once
+    and kept by checkpoint id (the newest `max_entries`); a refresh only loads
+    and renders checkpoints not seen before. Listing goes through the
+    `HistoryIndex`, and `full` renders a single checkpoint with its whole
+    plan, draft, critique and research when it is expanded.
+    """
+
+    def __init__(self, graph, history, resolve_content, max_entries=2048):
+        self.graph = graph
+        self.history = history
+        # WriterGUI.resolve_content: state values -> research passages
+        self.resolve_content = resolve_content
+        self.max_entries = max_entries
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _render(self, entry):
+        values = self.graph.get_state(entry.config).values
+        parts = [
+            f"🔹 Checkpoint ID: {entry.checkpoint_id[:16]}...\n",
+            f"🔹 Thread ID: {entry.thread_id}\n",
+            f"🔹 Step: {values.get('count', 'N/A')}\n",
+            f"🔹 Last Node: {values.get('lnode', 'N/A')}\n",
+            f"🔹 Next Node: {entry.next if entry.next else 'END'}\n",
+            f"🔹 Revision: {values.get('revision_number', 'N/A')}\n\n",
+        ]
+        if "task" in values:
+            parts.append(f"📝 Task:\n   {values['task']}\n\n")
+        if values.get("plan", "no plan") != "no plan":
+            parts.append(f"📋 Plan Preview:\n   {_preview(values['plan'])}...\n\n")
+        if values.get("draft", "no draft") != "no draft":
+            parts.append(f"✍️ Draft Preview:\n   {_preview(values['draft'])}...\n\n")
+        if values.get("critique", "no critique") != "no critique":
+            parts.append(
+                f"💭 Critique Preview:\n   {_preview(values['critique'])}...\n\n"
+            )
+        content = values.get("content") or []
+        if content:
+            # only the previews shown are resolved from the passage pool
+            parts.append(f"🔍 Research Items: {len(content)}\n")
+            shown = self.resolve_content({"content": content[:3]})
+            for i, item in enumerate(shown, 1):
+                parts.append(f"   {i}. {_preview(passage_text(item), 100)}...\n")
+            if len(content) > 3:
+                parts.append(f"   ... and {len(content) - 3} more items\n")
+            parts.append("\n")
+        if values.get("queries", "no queries") != "no queries":
+            parts.append(f"🔎 Queries: {values['queries']}\n\n")
+        return "".join(parts)
+
+    def summary(self, entry):
+        with self._lock:
+            text = self._summaries.get(entry.checkpoint_id)
+            if text is not None:
+                self._summaries.move_to_end(entry.checkpoint_id)
+                return text
+        text = self._render(entry)
+        with self._lock:
+            self._summaries[entry.checkpoint_id] = text
+            while len(self._summaries) > self.max_entries:
+                self._summaries.popitem(last=False)
+        return text
+
+    def page(self, thread, page=0, page_size=10):
+        """One page of snapshots, newest first: (text, entries, page count)."""
+        pages = max(1, -(-self.history.count(thread) // page_size))
+        page = min(max(page, 0), pages - 1)
+        entries = self.history.page(thread, page * page_size, page_size)
+        parts = []
+        for number, entry in enumerate(entries, page * page_size + 1):
+            parts.append(f"{RULE}\n📌 SNAPSHOT #{number}\n{RULE}\n\n")
+            parts.append(self.summary(entry))
+            parts.append("\n")
+        return "".join(parts), entries, pages
+
+    def full(self, thread, checkpoint_id):
+        """Every field of one checkpoint, research passages in full."""
+        entry = self.history.get(thread, checkpoint_id)
+        if entry is None:
+            return ""
+        values = self.graph.get_state(entry.config).values
+        parts = [self.summary(entry)]
+        for key, title in (
+            ("plan", "📋 Plan"),
+            ("draft", "✍️ Draft"),
+            ("critique", "💭 Critique"),
+        ):
+            if values.get(key):
+                parts.append(f"{RULE}\n{title}\n{RULE}\n{values[key]}\n\n")
+        content = self.resolve_content(values)
+        if content:
+            parts.append(f"{RULE}\n🔍 Research\n{RULE}\n")
+            parts.append("\n\n".join(format_passage(item) for item in content))
+            parts.append("\n")
+        return "".join(parts)
@@ -0,0 +1,127 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrumentation import DeferredMetrics, run_deferred
+
+
+class Speculation:
+    """A node run started at one checkpoint, before the user continued."""
+
+    def __init__(self, checkpoint_id, node, future, metrics):
+        self.checkpoint_id = checkpoint_id
+        self.node = node
+        self.future = future
+        # held-back metric updates and span outcomes of the run
+        self.metrics = metrics
+
+    def discard(self):
+        self.future.cancel()
+        self.metrics.discard()
+
+
+class Speculator:
+    """Runs the next node of a paused thread while the user reviews the step.
+
+    `nodes` maps node names to the runnables registered in the graph (see
+    `Agent.nodes`). `start` runs the single next node of the thread's latest
+    checkpoint on a worker thread, and `commit` writes its update with
+    `update_state(as_node=...)` when the user continues from that same
+    checkpoint. A thread changed in the meantime (`modify_state`,
+    `copy_state`) has a new checkpoint id, and a run still going when the
+    user continues would leave the step without streamed output, so both are
+    discarded and the node runs normally. Discarded runs still spend their
+    model calls and searches; their spans are marked with the outcome, and
+    the node totals, convergence and revision counts they would add are only
+    applied on commit.
+    """
+
+    def __init__(self, graph, nodes, max_workers=4):
+        self.graph = graph
+        self.nodes = nodes
+        self.pool = ThreadPoolExecutor(max_workers, thread_name_prefix="speculate")
+        self.pending = {}  # thread_id -> Speculation
+        self.committed = 0
+        self.discarded = 0
+        self._lock = threading.Lock()
+
+    def _thread_id(self, thread):
+        return thread["configurable"]["thread_id"]
+
+    def _drop(self, thread_id):
+        speculation = self.pending.pop(thread_id, None)
+        if speculation is not None:
+            speculation.discard()
+            self.discarded += 1
+
+    def start(self, thread):
+        """Speculate on the next node of `thread`; False if there is none to run."""
+        state = self.graph.get_state(thread)
+        # parallel branches are left to the graph
+        if len(state.next) != 1 or state.next[0] not in self.nodes:
+            return False
+        node = state.next[0]
+        thread_id = self._thread_id(thread)
+        checkpoint_id = state.config["configurable"]["checkpoint_id"]
+        with self._lock:
+            current = self.pending.get(thread_id)
+            if current is not None and current.checkpoint_id == checkpoint_id:
+                return True
+            self._drop(thread_id)
+            metrics = DeferredMetrics()
+            future = self.pool.submit(
+                run_deferred, metrics, self.nodes[node].invoke, state.values, thread
+            )
+            self.pending[thread_id] = Speculation(checkpoint_id, node, future, metrics)
+        return True
+
+    def commit(self, thread):
+        """Apply the speculative result for `thread`'s latest checkpoint.
+
+        Returns (node, update) once committed, or None when there is no
+        finished result for this checkpoint or the speculative run failed. A
+        run that has not finished yet is discarded rather than waited on, so
+        the caller can stream the node instead.
+        """
+        thread_id = self._thread_id(thread)
+        with self._lock:
+            speculation = self.pending.pop(thread_id, None)
+        if speculation is None:
+            return None
+        state = self.graph.get_state(thread)
+        current = state.config["configurable"]["checkpoint_id"]
+        if current != speculation.checkpoint_id or not speculation.future.done():
+            return self._discarded(speculation)
+        try:
+            update = speculation.future.result()
+        except Exception as exc:
+            print(f"Warning: speculative {speculation.node} failed ({exc}); rerunning")
+            return self._discarded(speculation)
+        self.graph.update_state(state.config, update, as_node=speculation.node)
+        speculation.metrics.commit()
+        with self._lock:
+            self.committed += 1
+        return speculation.node, update
+
+    def _discarded(self, speculation):
+        speculation.discard()
+        with self._lock:
+            self.discarded += 1
+        return None
+
+    def discard(self, thread):
+        """Drop the speculation for `thread`, e.g. when its session leaves it."""
+        with self._lock:
+            self._drop(self._thread_id(thread))
+
+    def shutdown(self):
+        with self._lock:
+            for speculation in self.pending.values():
+                speculation.discard()
+            self.pending.clear()
+        self.pool.shutdown(wait=False)
+
+    def metrics(self):
+        return {
+            "speculations_committed": self.committed,
+            "speculations_discarded": self.discarded,
+        }
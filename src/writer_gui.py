@@ -1,54 +1,76 @@
 import os
+import time
 
 import gradio as gr
 
+from .agent_state import new_essay_state
+from .checkpointing import next_thread_id
+from .content_store import format_passage
+from .history_index import HistoryIndex
+from .live_log import LiveLog, format_update
+from .session import Session, ThreadIds
+from .snapshots import SnapshotRenderer
+
 
 class WriterGUI:
-    def __init__(self, graph, share=False):
+    def __init__(
+        self,
+        graph,
+        share=False,
+        concurrency_limit=4,
+        passages=None,
+        history_limit=50,
+        snapshot_page_size=10,
+        tracer=None,
+        speculator=None,
+    ):
         self.graph = graph
+        # speculation.Speculator that runs the next node while a thread is paused
+        self.speculator = speculator
+        # instrumentation Tracer shown in the Metrics tab
+        self.tracer = tracer
+        self.history = HistoryIndex(graph)
+        # newest checkpoints listed in the step dropdown and snapshot tab
+        self.history_limit = history_limit
+        # snapshot tab: summaries rendered once per checkpoint, shown a page at a time
+        self.snapshot_page_size = snapshot_page_size
+        self.snapshots = SnapshotRenderer(graph, self.history, self.resolve_content)
+        # PassagePool that resolves the passage ids stored in state["content"]
+        self.passages = passages
         self.share = share
-        self.partial_message = ""
-        self.response = {}
+        # number of sessions whose graph runs may execute at the same time
+        self.concurrency_limit = concurrency_limit
+        self.live_log = LiveLog()
         self.max_iterations = 10
-        self.iterations = []
-        self.threads = []
-        self.thread_id = -1
-        self.thread = {"configurable": {"thread_id": str(self.thread_id)}}
-        # self.sdisps = {} #global
+        # continue numbering after the threads a durable checkpointer kept
+        self.thread_ids = ThreadIds(next_thread_id(graph.checkpointer))
         self.demo = self.create_interface()
 
-    def run_agent(self, start, topic, stop_after):
-        # global partial_message, thread_id,thread
-        # global response, max_iterations, iterations, threads
+    def run_agent(self, session, start, topic, stop_after):
         if start:
-            self.iterations.append(0)
-            config = {
-                "task": topic,
-                "max_revisions": 2,
-                "revision_number": 0,
-                "lnode": "",
-                "planner": "no plan",
-                "draft": "no draft",
-                "critique": "no critique",
-                "content": [
-                    "no content",
-                ],
-                "queries": "no queries",
-                "count": 0,
-            }
-            self.thread_id += 1  # new agent, new thread
-            self.threads.append(self.thread_id)
+            config = new_essay_state(topic, max_revisions=2)
+            self.leave_thread(session)
+            session.thread_id = self.thread_ids.next()  # new agent, new thread
+            session.threads.append(session.thread_id)
+            session.iterations[session.thread_id] = 0
         else:
             config = None
-        self.thread = {"configurable": {"thread_id": str(self.thread_id)}}
-        while self.iterations[self.thread_id] < self.max_iterations:
-            self.response = self.graph.invoke(config, self.thread)
-            self.iterations[self.thread_id] += 1
-            self.partial_message += str(self.response)
-            self.partial_message += "\n------------------\n\n"
-            ## fix
-            lnode, nnode, _, rev, acount = self.get_disp_state()
-            yield self.partial_message, lnode, nnode, self.thread_id, rev, acount
+        while session.iterations[session.thread_id] < self.max_iterations:
+            # a node that already ran while the thread was paused is committed
+            # instead; otherwise stream tokens as they are produced
+            if config is not None or not self.commit_speculation(session):
+                yield from self.stream_step(session, config)
+            session.iterations[session.thread_id] += 1
+            lnode, nnode, _, rev, acount = self.get_disp_state(session)
+            yield (
+                self.live_log.render(session.thread_id),
+                lnode,
+                nnode,
+                session.thread_id,
+                rev,
+                acount,
+                session.timing,
+            )
             config = None  # need
             # print(f"run_agent:{lnode}")
             if not nnode:
@@ -56,63 +78,166 @@ class WriterGUI:
                 return
             if lnode in stop_after:
                 # print(f"stopping due to stop_after {lnode}")
-                return
+                break
             else:
                 # print(f"Not stopping on lnode {lnode}")
                 pass
+        # start on the next node while the user reviews this step
+        paused = session.iterations[session.thread_id] < self.max_iterations
+        if self.speculator is not None and paused:
+            self.speculator.start(session.thread)
         return
 
-    def get_disp_state(
-        self,
-    ):
-        current_state = self.graph.get_state(self.thread)
+    def leave_thread(self, session):
+        """Drop what was kept for the thread `session` is moving away from."""
+        if session.thread_id == -1:
+            return
+        if self.speculator is not None:
+            self.speculator.discard(session.thread)
+        self.history.forget(session.thread)
+
+    def forget_threads(self, thread_ids):
+        """Drop the index of threads deleted from the checkpointer."""
+        for thread_id in thread_ids:
+            self.history.forget({"configurable": {"thread_id": thread_id}})
+
+    def commit_speculation(self, session):
+        """Apply the speculative run of the next node, if it is still valid."""
+        if self.speculator is None:
+            return False
+        committed = self.speculator.commit(session.thread)
+        if committed is None:
+            return False
+        node, update = committed
+        self.live_log.add(session.thread_id, format_update(node, update))
+        session.timing = f"{node}: ran while paused"
+        return True
+
+    def stream_step(self, session, config):
+        """Run the graph up to its next interrupt, yielding as tokens arrive.
+
+        Message chunks are appended to the thread's live log as they stream in
+        and each finished node adds a summary of its state delta. Wall time and
+        time to first token per node are kept in `session.timing`.
+        """
+        start = time.perf_counter()
+        first_token = {}
+        timings = []
+        no_change = gr.update()
+        thread_id = session.thread_id
+        for mode, chunk in self.graph.stream(
+            config, session.thread, stream_mode=["messages", "updates"]
+        ):
+            if mode == "messages":
+                message, metadata = chunk
+                if not isinstance(message.content, str) or not message.content:
+                    continue
+                node = metadata.get("langgraph_node", "")
+                if node not in first_token:
+                    first_token[node] = time.perf_counter() - start
+                    self.live_log.add(thread_id, f"[{node}] ")
+                self.live_log.extend(thread_id, message.content)
+            else:
+                for node, update in chunk.items():
+                    if node.startswith("__"):
+                        continue
+                    elapsed = time.perf_counter() - start
+                    ttft = first_token.get(node)
+                    timings.append(
+                        f"{node}: {elapsed:.2f}s"
+                        + (f" (first token {ttft:.2f}s)" if ttft is not None else "")
+                    )
+                    self.live_log.add(thread_id, format_update(node, update))
+                session.timing = ", ".join(timings)
+            yield (
+                self.live_log.render(thread_id),
+                no_change,
+                no_change,
+                thread_id,
+                no_change,
+                no_change,
+                ", ".join(timings) or "running...",
+            )
+
+    def get_disp_state(self, session):
+        current_state = self.graph.get_state(session.thread)
         lnode = current_state.values["lnode"]
         acount = current_state.values["count"]
         rev = current_state.values["revision_number"]
         nnode = current_state.next
-        # print  (lnode,nnode,self.thread_id,rev,acount)
-        return lnode, nnode, self.thread_id, rev, acount
+        # print  (lnode,nnode,session.thread_id,rev,acount)
+        return lnode, nnode, session.thread_id, rev, acount
 
-    def get_state(self, key):
-        current_values = self.graph.get_state(self.thread)
+    def get_state(self, session, key):
+        current_values = self.graph.get_state(session.thread)
         if key in current_values.values:
-            lnode, nnode, self.thread_id, rev, astep = self.get_disp_state()
-            new_label = f"last_node: {lnode}, thread_id: {self.thread_id}, rev: {rev}, step: {astep}"
+            lnode, nnode, thread_id, rev, astep = self.get_disp_state(session)
+            new_label = f"last_node: {lnode}, thread_id: {thread_id}, rev: {rev}, step: {astep}"
             return gr.update(label=new_label, value=current_values.values[key])
         else:
             return ""
 
-    def get_content(
-        self,
-    ):
-        current_values = self.graph.get_state(self.thread)
+    def resolve_content(self, values):
+        """Research passages of a state, looked up from their ids."""
+        content = values.get("content") or []
+        if self.passages is None:
+            return content
+        return self.passages.get_many(content)
+
+    def get_content(self, session):
+        current_values = self.graph.get_state(session.thread)
         if "content" in current_values.values:
-            content = current_values.values["content"]
-            lnode, nnode, thread_id, rev, astep = self.get_disp_state()
-            new_label = f"last_node: {lnode}, thread_id: {self.thread_id}, rev: {rev}, step: {astep}"
+            content = self.resolve_content(current_values.values)
+            lnode, nnode, thread_id, rev, astep = self.get_disp_state(session)
+            new_label = f"last_node: {lnode}, thread_id: {thread_id}, rev: {rev}, step: {astep}"
             return gr.update(
-                label=new_label, value="\n\n".join(item for item in content) + "\n\n"
+                label=new_label,
+                value="\n\n".join(format_passage(item) for item in content) + "\n\n",
             )
         else:
             return ""
 
-    def update_hist_pd(
-        self,
-    ):
+    def get_metrics(self, session):
+        """Per-node summary across sessions, and the spans of this session's thread."""
+        if self.tracer is None:
+            return "Instrumentation is not enabled.", ""
+        summary = ""
+        for node, stats in self.tracer.summary().items():
+            summary += (
+                f"{node:<18} runs {stats['runs']:>4}  "
+                f"p50 {stats['p50_ms']:>9.1f} ms  p95 {stats['p95_ms']:>9.1f} ms  "
+                f"prompt {stats['mean_llm.prompt_tokens']:>7.0f}  "
+                f"completion {stats['mean_llm.completion_tokens']:>6.0f}  "
+                f"cached {stats['prompt_cache_hit_rate']:>4.0%}  "
+                f"searches {stats['mean_search.calls']:>4.1f}\n"
+            )
+        lines = []
+        for span in self.tracer.finished(session.thread_id):
+            attrs = span["attributes"]
+            line = (
+                f"{span['name']:<18} {span['duration_ms']:>9.1f} ms  "
+                f"tokens {attrs['llm.prompt_tokens']}"
+                f"+{attrs['llm.completion_tokens']}"
+                f" ({attrs['llm.cached_tokens']} cached)  "
+                f"searches {attrs['search.calls']}"
+                f" ({attrs['search.latency_ms']:.0f} ms)  "
+                f"content {attrs['content.size']}"
+            )
+            if "cost_usd" in attrs:
+                line += f"  ${attrs['cost_usd']:.4f}"
+            if "speculation" in attrs:
+                line += f"  [speculative: {attrs['speculation']}]"
+            if span["status"] != "ok":
+                line += f"  [{span['status']}]"
+            lines.append(line)
+        return summary or "No node runs yet.", "\n".join(lines)
+
+    def update_hist_pd(self, session):
         # print("update_hist_pd")
-        hist = []
-        # curiously, this generator returns the latest first
-        for state in self.graph.get_state_history(self.thread):
-            if state.metadata["step"] < 1:
-                continue
-            checkpoint_id = state.config["configurable"]["checkpoint_id"]
-            tid = state.config["configurable"]["thread_id"]
-            count = state.values["count"]
-            lnode = state.values["lnode"]
-            rev = state.values["revision_number"]
-            nnode = state.next
-            st = f"{tid}:{count}:{lnode}:{nnode}:{rev}:{checkpoint_id}"
-            hist.append(st)
+        hist = [
+            entry.label
+            for entry in self.history.page(session.thread, limit=self.history_limit)
+        ]
         return gr.Dropdown(
             label="update_state from: thread:count:last_node:next_node:rev:checkpoint_id",
             choices=hist,
@@ -120,14 +245,11 @@ class WriterGUI:
             interactive=True,
         )
 
-    def find_config(self, checkpoint_id):
-        for state in self.graph.get_state_history(self.thread):
-            config = state.config
-            if config["configurable"]["checkpoint_id"] == checkpoint_id:
-                return config
-        return None
+    def find_config(self, session, checkpoint_id):
+        entry = self.history.get(session.thread, checkpoint_id)
+        return entry.config if entry is not None else None
 
-    def copy_state(self, hist_str):
+    def copy_state(self, session, hist_str):
         """result of selecting an old state from the step pulldown. Note does not change thread.
         This copies an old state to a new current state.
         """
@@ -136,7 +258,7 @@ class WriterGUI:
 
         checkpoint_id = hist_str.split(":")[-1]
         # print(f"copy_state from {checkpoint_id}")
-        config = self.find_config(checkpoint_id)
+        config = self.find_config(session, checkpoint_id)
 
         # Handle case where config is not found
         if config is None:
@@ -145,10 +267,19 @@ class WriterGUI:
 
         # print(config)
         state = self.graph.get_state(config)
+        if not state.values:  # deleted by the compactor since it was listed
+            print(f"Warning: Checkpoint {checkpoint_id} no longer exists")
+            return None, None, None, None, None
+        if self.passages is not None:
+            # the copy keeps the passages it refers to from expiring
+            self.passages.touch(
+                state.values.get("content", [])
+                + state.values.get("writer_passages", [])
+            )
         self.graph.update_state(
-            self.thread, state.values, as_node=state.values["lnode"]
+            session.thread, state.values, as_node=state.values["lnode"]
         )
-        new_state = self.graph.get_state(self.thread)  # should now match
+        new_state = self.graph.get_state(session.thread)  # should now match
         new_checkpoint_id = new_state.config["configurable"]["checkpoint_id"]
         new_state.config["configurable"]["thread_id"]
         count = new_state.values["count"]
@@ -157,24 +288,25 @@ class WriterGUI:
         nnode = new_state.next
         return lnode, nnode, new_checkpoint_id, rev, count
 
-    def update_thread_pd(
-        self,
-    ):
+    def update_thread_pd(self, session):
         # print("update_thread_pd")
         return gr.Dropdown(
             label="choose thread",
-            choices=self.threads,
-            value=self.thread_id,
+            choices=session.threads,
+            value=session.thread_id,
             interactive=True,
         )
 
-    def switch_thread(self, new_thread_id):
+    def switch_thread(self, session, new_thread_id):
         # print(f"switch_thread{new_thread_id}")
-        self.thread = {"configurable": {"thread_id": str(new_thread_id)}}
-        self.thread_id = new_thread_id
+        # only threads started from this session can be selected
+        if new_thread_id in session.threads:
+            if new_thread_id != session.thread_id:
+                self.leave_thread(session)
+            session.switch(new_thread_id)
         return
 
-    def modify_state(self, key, asnode, new_state):
+    def modify_state(self, session, key, asnode, new_state):
         """
         Modifies a single value identified by 'key' in the current state, updates the state with the new value.
 
@@ -183,6 +315,7 @@ class WriterGUI:
         node each time it is called with different keys, as identified by 'asnode'.
 
         Parameters:
+        - session (Session): The browser session whose current thread is modified.
         - key (str): The key identifying the value to modify in the state.
         - asnode (str): Identifier for the node to update in the graph after modification.
         - new_state (any): The new value to assign to the specified key in the state.
@@ -191,9 +324,9 @@ class WriterGUI:
         - Calling this method multiple times with different keys will create a new 'current state' node for each update.
         - After modification, the method does not resume execution in the updated state.
         """
-        current_values = self.graph.get_state(self.thread)
+        current_values = self.graph.get_state(session.thread)
         current_values.values[key] = new_state
-        self.graph.update_state(self.thread, current_values.values, as_node=asnode)
+        self.graph.update_state(session.thread, current_values.values, as_node=asnode)
         return
 
     def create_interface(self):
@@ -261,23 +394,18 @@ class WriterGUI:
             title="Quality Essay Writer",
         ) as demo:
 
-            def updt_disp():
+            session = gr.State(Session())
+
+            def updt_disp(session):
                 """general update display on state change"""
-                current_state = self.graph.get_state(self.thread)
-                hist = []
-                # curiously, this generator returns the latest first
-                for state in self.graph.get_state_history(self.thread):
-                    if state.metadata.get("step", 0) < 1:  # ignore early states
-                        continue
-                    print(state.config["configurable"])
-                    s_checkpoint_id = state.config["configurable"]["checkpoint_id"]
-                    s_tid = state.config["configurable"]["thread_id"]
-                    s_count = state.values["count"]
-                    s_lnode = state.values["lnode"]
-                    s_rev = state.values["revision_number"]
-                    s_nnode = state.next
-                    st = f"{s_tid}:{s_count}:{s_lnode}:{s_nnode}:{s_rev}:{s_checkpoint_id}"
-                    hist.append(st)
+                current_state = self.graph.get_state(session.thread)
+                # newest first, early states skipped
+                hist = [
+                    entry.label
+                    for entry in self.history.page(
+                        session.thread, limit=self.history_limit
+                    )
+                ]
 
                 # Handle init call - return proper None values for all 8 outputs
                 if not current_state.metadata:
@@ -290,11 +418,11 @@ class WriterGUI:
                     count_bx: current_state.values.get("count", ""),
                     revision_bx: current_state.values.get("revision_number", ""),
                     nnode_bx: current_state.next if current_state.next else "",
-                    threadid_bx: self.thread_id,
+                    threadid_bx: session.thread_id,
                     thread_pd: gr.Dropdown(
                         label="choose thread",
-                        choices=self.threads,
-                        value=self.thread_id,
+                        choices=session.threads,
+                        value=session.thread_id,
                         interactive=True,
                     ),
                     step_pd: gr.Dropdown(
@@ -305,87 +433,39 @@ class WriterGUI:
                     ),
                 }
 
-            def get_snapshots():
-                """Format state snapshots in a nice, readable format"""
-                new_label = f"📸 Thread {self.thread_id} - State History"
-                sstate = ""
-
-                snapshot_count = 0
-                for state in self.graph.get_state_history(self.thread):
-                    if state.metadata.get("step", 0) < 1:
-                        continue
-
-                    snapshot_count += 1
-                    checkpoint_id = state.config["configurable"]["checkpoint_id"]
-
-                    # Header for each snapshot
-                    sstate += "=" * 80 + "\n"
-                    sstate += f"📌 SNAPSHOT #{snapshot_count}\n"
-                    sstate += "=" * 80 + "\n\n"
-
-                    # Basic info
-                    sstate += f"🔹 Checkpoint ID: {checkpoint_id[:16]}...\n"
-                    sstate += (
-                        f"🔹 Thread ID: {state.config['configurable']['thread_id']}\n"
-                    )
-                    sstate += f"🔹 Step: {state.values.get('count', 'N/A')}\n"
-                    sstate += f"🔹 Last Node: {state.values.get('lnode', 'N/A')}\n"
-                    sstate += f"🔹 Next Node: {state.next if state.next else 'END'}\n"
-                    sstate += (
-                        f"🔹 Revision: {state.values.get('revision_number', 'N/A')}\n"
+            def get_snapshots(session, page, page_size):
+                """One page of state snapshots, and the page's checkpoints to expand."""
+                page_size = max(1, int(page_size or self.snapshot_page_size))
+                text, entries, pages = self.snapshots.page(
+                    session.thread, int(page or 0), page_size
+                )
+                page = min(max(int(page or 0), 0), pages - 1)
+                if not entries:
+                    text = "No snapshots available yet. Run the agent to generate snapshots."
+                label = (
+                    f"📸 Thread {session.thread_id} - State History"
+                    f" (page {page + 1} of {pages})"
+                )
+                first = page * page_size + 1
+                choices = [
+                    (
+                        f"#{n} step {e.count} {e.lnode} rev {e.rev}",
+                        e.checkpoint_id,
                     )
-                    sstate += "\n"
-
-                    # Task
-                    if "task" in state.values:
-                        sstate += f"📝 Task:\n   {state.values['task']}\n\n"
-
-                    # Plan preview
-                    if "plan" in state.values and state.values["plan"] != "no plan":
-                        plan_preview = state.values["plan"][:150].replace("\n", " ")
-                        sstate += f"📋 Plan Preview:\n   {plan_preview}...\n\n"
-
-                    # Draft preview
-                    if "draft" in state.values and state.values["draft"] != "no draft":
-                        draft_preview = state.values["draft"][:150].replace("\n", " ")
-                        sstate += f"✍️ Draft Preview:\n   {draft_preview}...\n\n"
-
-                    # Critique preview
-                    if (
-                        "critique" in state.values
-                        and state.values["critique"] != "no critique"
-                    ):
-                        critique_preview = state.values["critique"][:150].replace(
-                            "\n", " "
-                        )
-                        sstate += f"💭 Critique Preview:\n   {critique_preview}...\n\n"
-
-                    # Content count
-                    if "content" in state.values and state.values["content"] != [
-                        "no content"
-                    ]:
-                        content_count = len(state.values["content"])
-                        sstate += f"🔍 Research Items: {content_count}\n"
-                        for i, item in enumerate(state.values["content"][:3], 1):
-                            preview = item[:100].replace("\n", " ")
-                            sstate += f"   {i}. {preview}...\n"
-                        if content_count > 3:
-                            sstate += f"   ... and {content_count - 3} more items\n"
-                        sstate += "\n"
-
-                    # Queries
-                    if (
-                        "queries" in state.values
-                        and state.values["queries"] != "no queries"
-                    ):
-                        sstate += f"🔎 Queries: {state.values['queries']}\n\n"
-
-                    sstate += "\n"
-
-                if snapshot_count == 0:
-                    sstate = "No snapshots available yet. Run the agent to generate snapshots."
-
-                return gr.update(label=new_label, value=sstate)
+                    for n, e in enumerate(entries, first)
+                ]
+                return (
+                    gr.update(label=label, value=text),
+                    page,
+                    gr.Dropdown(
+                        choices=choices, value=choices[0][1] if choices else None
+                    ),
+                )
+
+            def get_snapshot(session, checkpoint_id):
+                if not checkpoint_id:
+                    return ""
+                return self.snapshots.full(session.thread, checkpoint_id)
 
             def vary_btn(stat):
                 # print(f"vary_btn{stat}")
@@ -450,6 +530,12 @@ class WriterGUI:
                         interactive=False,
                         scale=1,
                     )
+                with gr.Row():
+                    timing_bx = gr.Textbox(
+                        label="⏱️ Node Timing",
+                        interactive=False,
+                        scale=1,
+                    )
                 with gr.Accordion("Manage Agent", open=False):
                     checks = list(self.graph.nodes.keys())
                     checks.remove("__start__")
@@ -462,7 +548,7 @@ class WriterGUI:
                     )
                     with gr.Row():
                         thread_pd = gr.Dropdown(
-                            choices=self.threads,
+                            choices=[],
                             interactive=True,
                             label="select thread",
                             min_width=120,
@@ -486,6 +572,15 @@ class WriterGUI:
                 )
 
                 # actions
+                run_outputs = [
+                    live,
+                    lnode_bx,
+                    nnode_bx,
+                    threadid_bx,
+                    revision_bx,
+                    count_bx,
+                    timing_bx,
+                ]
                 sdisps = [
                     topic_bx,
                     lnode_bx,
@@ -496,21 +591,26 @@ class WriterGUI:
                     step_pd,
                     thread_pd,
                 ]
-                thread_pd.input(self.switch_thread, [thread_pd], None).then(
-                    fn=updt_disp, inputs=None, outputs=sdisps
+                thread_pd.input(self.switch_thread, [session, thread_pd], None).then(
+                    fn=updt_disp, inputs=session, outputs=sdisps
                 )
-                step_pd.input(self.copy_state, [step_pd], None).then(
-                    fn=updt_disp, inputs=None, outputs=sdisps
+                step_pd.input(self.copy_state, [session, step_pd], None).then(
+                    fn=updt_disp, inputs=session, outputs=sdisps
                 )
                 gen_btn.click(
                     vary_btn, gr.Number("secondary", visible=False), gen_btn
                 ).then(
                     fn=self.run_agent,
-                    inputs=[gr.Number(True, visible=False), topic_bx, stop_after],
-                    outputs=[live],
+                    inputs=[
+                        session,
+                        gr.Number(True, visible=False),
+                        topic_bx,
+                        stop_after,
+                    ],
+                    outputs=run_outputs,
                     show_progress=True,
                 ).then(
-                    fn=updt_disp, inputs=None, outputs=sdisps
+                    fn=updt_disp, inputs=session, outputs=sdisps
                 ).then(
                     vary_btn, gr.Number("primary", visible=False), gen_btn
                 ).then(
@@ -520,10 +620,15 @@ class WriterGUI:
                     vary_btn, gr.Number("secondary", visible=False), cont_btn
                 ).then(
                     fn=self.run_agent,
-                    inputs=[gr.Number(False, visible=False), topic_bx, stop_after],
-                    outputs=[live],
+                    inputs=[
+                        session,
+                        gr.Number(False, visible=False),
+                        topic_bx,
+                        stop_after,
+                    ],
+                    outputs=run_outputs,
                 ).then(
-                    fn=updt_disp, inputs=None, outputs=sdisps
+                    fn=updt_disp, inputs=session, outputs=sdisps
                 ).then(
                     vary_btn, gr.Number("primary", visible=False), cont_btn
                 )
@@ -550,18 +655,19 @@ class WriterGUI:
                 )
                 refresh_btn.click(
                     fn=self.get_state,
-                    inputs=gr.Number("plan", visible=False),
+                    inputs=[session, gr.Number("plan", visible=False)],
                     outputs=plan,
                 )
                 modify_btn.click(
                     fn=self.modify_state,
                     inputs=[
+                        session,
                         gr.Number("plan", visible=False),
                         gr.Number("planner", visible=False),
                         plan,
                     ],
                     outputs=None,
-                ).then(fn=updt_disp, inputs=None, outputs=sdisps)
+                ).then(fn=updt_disp, inputs=session, outputs=sdisps)
             with gr.Tab("🔍 Research Content") as research_tab:
                 gr.Markdown("### Research Materials")
                 refresh_btn = gr.Button(
@@ -575,7 +681,9 @@ class WriterGUI:
                     max_lines=25,
                     placeholder="Research content will appear here...",
                 )
-                refresh_btn.click(fn=self.get_content, inputs=None, outputs=content_bx)
+                refresh_btn.click(
+                    fn=self.get_content, inputs=session, outputs=content_bx
+                )
             with gr.Tab("✍️ Draft"):
                 gr.Markdown("### Essay Draft")
                 with gr.Row():
@@ -598,18 +706,19 @@ class WriterGUI:
                 )
                 refresh_btn.click(
                     fn=self.get_state,
-                    inputs=gr.Number("draft", visible=False),
+                    inputs=[session, gr.Number("draft", visible=False)],
                     outputs=draft_bx,
                 )
                 modify_btn.click(
                     fn=self.modify_state,
                     inputs=[
+                        session,
                         gr.Number("draft", visible=False),
                         gr.Number("generate", visible=False),
                         draft_bx,
                     ],
                     outputs=None,
-                ).then(fn=updt_disp, inputs=None, outputs=sdisps)
+                ).then(fn=updt_disp, inputs=session, outputs=sdisps)
             with gr.Tab("💭 Critique"):
                 gr.Markdown("### Essay Critique & Feedback")
                 with gr.Row():
@@ -632,18 +741,19 @@ class WriterGUI:
                 )
                 refresh_btn.click(
                     fn=self.get_state,
-                    inputs=gr.Number("critique", visible=False),
+                    inputs=[session, gr.Number("critique", visible=False)],
                     outputs=critique_bx,
                 )
                 modify_btn.click(
                     fn=self.modify_state,
                     inputs=[
+                        session,
                         gr.Number("critique", visible=False),
                         gr.Number("reflect", visible=False),
                         critique_bx,
                     ],
                     outputs=None,
-                ).then(fn=updt_disp, inputs=None, outputs=sdisps)
+                ).then(fn=updt_disp, inputs=session, outputs=sdisps)
             with gr.Tab("📸 State Snapshots"):
                 gr.Markdown("### Agent State History")
                 refresh_btn = gr.Button(
@@ -651,30 +761,118 @@ class WriterGUI:
                     variant="primary",
                     elem_classes=["refresh-btn"],
                 )
+                with gr.Row():
+                    newer_btn = gr.Button("◀ Newer")
+                    older_btn = gr.Button("Older ▶")
+                    snapshot_page_size = gr.Number(
+                        label="Snapshots per page",
+                        value=self.snapshot_page_size,
+                        precision=0,
+                        minimum=1,
+                    )
+                snapshot_page = gr.State(0)
                 snapshots = gr.Textbox(
                     label="State Snapshots Summaries",
                     lines=15,
                     max_lines=25,
                     placeholder="State snapshots will appear here...",
                 )
-                refresh_btn.click(fn=get_snapshots, inputs=None, outputs=snapshots)
+                snapshot_pick = gr.Dropdown(
+                    label="Snapshot to expand", choices=[], interactive=True
+                )
+                # the full checkpoint is only loaded once it is expanded
+                with gr.Accordion("🔎 Full snapshot", open=False) as snapshot_panel:
+                    snapshot_full = gr.Textbox(lines=15, max_lines=40, show_label=False)
+                snapshot_outputs = [snapshots, snapshot_page, snapshot_pick]
+                refresh_btn.click(
+                    fn=get_snapshots,
+                    inputs=[session, snapshot_page, snapshot_page_size],
+                    outputs=snapshot_outputs,
+                )
+                snapshot_page_size.submit(
+                    fn=lambda session, size: get_snapshots(session, 0, size),
+                    inputs=[session, snapshot_page_size],
+                    outputs=snapshot_outputs,
+                )
+                newer_btn.click(
+                    fn=lambda session, page, size: get_snapshots(
+                        session, page - 1, size
+                    ),
+                    inputs=[session, snapshot_page, snapshot_page_size],
+                    outputs=snapshot_outputs,
+                )
+                older_btn.click(
+                    fn=lambda session, page, size: get_snapshots(
+                        session, page + 1, size
+                    ),
+                    inputs=[session, snapshot_page, snapshot_page_size],
+                    outputs=snapshot_outputs,
+                )
+                snapshot_panel.expand(
+                    fn=get_snapshot,
+                    inputs=[session, snapshot_pick],
+                    outputs=snapshot_full,
+                )
+                snapshot_pick.input(
+                    fn=get_snapshot,
+                    inputs=[session, snapshot_pick],
+                    outputs=snapshot_full,
+                )
+
+            with gr.Tab("📈 Metrics") as metrics_tab:
+                gr.Markdown("### Node Latency, Tokens and Searches")
+                metrics_btn = gr.Button(
+                    "🔄 Refresh Metrics",
+                    variant="primary",
+                    elem_classes=["refresh-btn"],
+                )
+                metrics_summary = gr.Textbox(
+                    label="Per-node summary (all sessions)",
+                    lines=6,
+                    max_lines=10,
+                )
+                metrics_spans = gr.Textbox(
+                    label="Node runs in this thread",
+                    lines=12,
+                    max_lines=25,
+                )
+                metrics_btn.click(
+                    fn=self.get_metrics,
+                    inputs=session,
+                    outputs=[metrics_summary, metrics_spans],
+                )
 
-            # Auto-refresh when navigating to Plan and Research tabs
+            # Auto-refresh when navigating to Plan, Research and Metrics tabs
             plan_tab.select(
                 fn=self.get_state,
-                inputs=gr.Number("plan", visible=False),
+                inputs=[session, gr.Number("plan", visible=False)],
                 outputs=plan,
             )
             research_tab.select(
                 fn=self.get_content,
-                inputs=None,
+                inputs=session,
                 outputs=content_bx,
             )
+            metrics_tab.select(
+                fn=self.get_metrics,
+                inputs=session,
+                outputs=[metrics_summary, metrics_spans],
+            )
 
         return demo
 
-    def launch(self, share=None):
+    def launch(self, share=None, on_ready=None):
+        """Start the server; `on_ready` is called once it accepts requests."""
+        self.demo.queue(default_concurrency_limit=self.concurrency_limit)
         if port := os.getenv("PORT1"):
-            self.demo.launch(share=True, server_port=int(port), server_name="0.0.0.0")
+            self.demo.launch(
+                share=True,
+                server_port=int(port),
+                server_name="0.0.0.0",
+                prevent_thread_lock=True,
+            )
         else:
-            self.demo.launch(share=self.share)
+            self.demo.launch(share=self.share, prevent_thread_lock=True)
+        if on_ready is not None:
+            on_ready()
+        self.demo.block_thread()